@@ -1,9 +1,17 @@
+from django.utils.decorators import method_decorator
 from django.views.generic.base import TemplateView
 
+from core.db import read_replica
+from core.prerender import PrerenderedMixin
 
-class AboutAuthorView(TemplateView):
+
+@method_decorator(read_replica, name='dispatch')
+class AboutAuthorView(PrerenderedMixin, TemplateView):
     template_name = 'about/author.html'
+    prerendered_name = 'about_author'
 
 
-class AboutTechView(TemplateView):
+@method_decorator(read_replica, name='dispatch')
+class AboutTechView(PrerenderedMixin, TemplateView):
     template_name = 'about/tech.html'
+    prerendered_name = 'about_tech'
@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'func', 'status', 'attempts', 'run_at', 'created')
+    list_filter = ('status', 'func')
+    search_fields = ('func',)
+    empty_value_display = '-пусто-'
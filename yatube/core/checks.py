@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(deploy=True)
+def shared_cache(app_configs, **kwargs):
+    """Страничный кэш и ETag лент сбрасываются только в общем кэше."""
+    if settings.CACHES['default']['BACKEND'] not in LOCAL_CACHES:
+        return []
+    return [Warning(
+        'Кэш по умолчанию живёт в памяти процесса: сброс страниц и ETag '
+        'в одном процессе не виден остальным до '
+        'PAGE_GENERATION_TIMEOUT.',
+        hint='Задайте общий кэш через YATUBE_CACHE_BACKEND и '
+             'YATUBE_CACHE_LOCATION.',
+        id='core.W001',
+    )]
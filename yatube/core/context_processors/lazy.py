@@ -0,0 +1,61 @@
+import time
+from datetime import datetime, timedelta
+from functools import partial, wraps
+
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from core import profiling
+
+
+def lazy_processor(processor):
+    """
+    Сделать значения context processor ленивыми.
+
+    processor возвращает словарь {переменная: функция от request}.
+    Функция вызывается, только когда шаблон обращается к переменной,
+    и не больше одного раза за запрос: все шаблоны запроса делят
+    результат. Время вычисления попадает в замеры core.profiling.
+    """
+    label = f'{processor.__module__}.{processor.__name__}'
+
+    @wraps(processor)
+    def wrapper(request):
+        return {
+            name: SimpleLazyObject(
+                partial(_evaluate, request, f'{label}.{name}', factory)
+            )
+            for name, factory in processor(request).items()
+        }
+    return wrapper
+
+
+def _evaluate(request, key, factory):
+    memo = request.__dict__.setdefault('_context_memo', {})
+    if key not in memo:
+        started = time.perf_counter()
+        memo[key] = factory(request)
+        profiling.record_context(
+            key, (time.perf_counter() - started) * 1000
+        )
+    return memo[key]
+
+
+def daily(func):
+    """Кэшировать результат func в процессе до местной полуночи.
+
+    Аргументы в ключ не входят: значение общее для всех вызовов.
+    """
+    state = {'expires': 0}
+
+    @wraps(func)
+    def wrapper(*args):
+        if time.time() >= state['expires']:
+            state['value'] = func(*args)
+            tomorrow = timezone.localdate() + timedelta(days=1)
+            state['expires'] = timezone.make_aware(
+                datetime.combine(tomorrow, datetime.min.time())
+            ).timestamp()
+        return state['value']
+    wrapper.cache_clear = partial(state.update, expires=0)
+    return wrapper
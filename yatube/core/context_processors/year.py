@@ -1,9 +1,16 @@
 from django.utils import timezone
 
+from .lazy import daily, lazy_processor
 
+
+@daily
+def current_year(request):
+    return timezone.now().year
+
+
+@lazy_processor
 def year(request):
     """Добавляет переменную с текущим годом."""
-    now_year = timezone.now().year
     return {
-        'year': now_year,
+        'year': current_year,
     }
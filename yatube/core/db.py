@@ -0,0 +1,105 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY = 'default'
+STICKY_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+
+
+def current_replica():
+    """Реплика, из которой читает текущий поток, или None."""
+    return getattr(_state, 'replica', None)
+
+
+@contextmanager
+def reading_from_replica(alias=None):
+    """
+    Читать из одной реплики до конца блока: alias или случайной.
+
+    Реплика выбирается один раз на блок: разные реплики отстают
+    по-разному, и страница, собранная из нескольких, была бы
+    несогласованной.
+    """
+    previous = current_replica()
+    if alias is not None:
+        _state.replica = alias
+    elif settings.DATABASE_REPLICAS:
+        _state.replica = random.choice(settings.DATABASE_REPLICAS)
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def pinned_to_primary(request):
+    """Пользователь недавно писал и должен видеть свои изменения."""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_replica(view):
+    """
+    Выполнять view на реплике, если запрос только читает.
+
+    После записи пользователь REPLICA_STICKY_SECONDS читает с основной
+    базы: реплика может ещё не получить его изменения.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS or pinned_to_primary(request):
+            return view(request, *args, **kwargs)
+        with reading_from_replica():
+            response = view(request, *args, **kwargs)
+            # TemplateResponse рендерится лениво, уже после выхода из view.
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+    return wrapper
+
+
+class PrimaryStickinessMiddleware:
+    """Закрепить за пользователем основную базу после любой записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            window = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, str(time.time() + window),
+                max_age=window, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class ReplicaRouter:
+    """
+    Чтение внутри read_replica - с выбранной реплики, всё остальное,
+    включая фоновые задачи и команды, - с основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        return current_replica() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
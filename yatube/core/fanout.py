@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+
+from .db import PRIMARY, current_replica, reading_from_replica
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.READ_FANOUT_WORKERS,
+            thread_name_prefix='reads',
+        )
+    return _executor
+
+
+def _execute_wrappers():
+    """Обёртки запросов на соединениях текущего потока по алиасам."""
+    return {
+        alias: list(connections[alias].execute_wrappers)
+        for alias in connections
+    }
+
+
+def _call_in_worker(call, replica, wrappers):
+    # Соединения потоков пула живут между задачами; закрываем те, что
+    # пережили CONN_MAX_AGE или сломались, как это делает запрос.
+    close_old_connections()
+    with ExitStack() as stack:
+        # Соединения потоков свои, и обёртки запроса (замер профайлера)
+        # сами на них не попадают.
+        for alias, items in wrappers.items():
+            for wrapper in items:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(wrapper)
+                )
+        stack.enter_context(reading_from_replica(replica))
+        return call()
+
+
+def gather(*calls):
+    """
+    Выполнить независимые чтения одновременно и вернуть их результаты.
+
+    calls - функции без аргументов; первая выполняется в текущем
+    потоке, остальные в пуле READ_FANOUT_WORKERS, каждая со своим
+    соединением, с той же базой, что и запрос, и с его обёртками
+    запросов (connection.execute_wrapper). Функции должны сами
+    вычислять queryset: ленивый queryset выполнится уже у вызывающего.
+    Внутри транзакции чтения идут по очереди - другие соединения не
+    видят её незакоммиченных строк.
+    """
+    if (not settings.READ_FANOUT_WORKERS or len(calls) < 2
+            or connection.in_atomic_block):
+        return [call() for call in calls]
+    # Без явного алиаса поток пула выбрал бы случайную реплику, а запрос,
+    # закреплённый за основной базой, должен читать только из неё.
+    replica = current_replica() or PRIMARY
+    wrappers = _execute_wrappers()
+    futures = [
+        _get_executor().submit(_call_in_worker, call, replica, wrappers)
+        for call in calls[1:]
+    ]
+    try:
+        first = calls[0]()
+    finally:
+        wait(futures)
+    return [first, *(future.result() for future in futures)]
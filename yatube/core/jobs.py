@@ -0,0 +1,175 @@
+import json
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_WORKERS,
+            thread_name_prefix='jobs',
+        )
+    return _executor
+
+
+def enqueue(func, *args, max_attempts=None):
+    """
+    Поставить func(*args) в очередь и вернуть задачу.
+
+    Строка задачи пишется в текущей транзакции, поэтому задача видна
+    исполнителям только после коммита и пропадает вместе с откатом.
+    Сразу после коммита задача уходит в пул потоков процесса
+    (BACKGROUND_WORKERS = 0 - выполняется в текущем потоке); повторы
+    после ошибок и всё, что процесс не успел, выполняет run_jobs.
+    Аргументы должны сериализоваться в JSON.
+    """
+    job = Job.objects.create(
+        func=f'{func.__module__}.{func.__qualname__}',
+        args=json.dumps(args),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    if settings.BACKGROUND_WORKERS:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run_in_worker, job.pk)
+        )
+    else:
+        transaction.on_commit(lambda: run_job(job.pk))
+    return job
+
+
+def retry_delay(attempts):
+    """Экспоненциальная пауза перед попыткой номер attempts + 1."""
+    return min(
+        settings.JOB_RETRY_DELAY * 2 ** (attempts - 1),
+        settings.JOB_RETRY_MAX_DELAY,
+    )
+
+
+def claim(job_id):
+    """Атомарно взять задачу в работу; False, если её уже взяли."""
+    return bool(Job.objects.filter(
+        pk=job_id, status=Job.PENDING, run_at__lte=timezone.now()
+    ).update(
+        status=Job.RUNNING,
+        locked_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    ))
+
+
+def heartbeat(job_id, stop):
+    """Продлевать блокировку задачи, пока не выставлено событие stop."""
+    while not stop.wait(settings.JOB_LOCK_TIMEOUT / 3):
+        Job.objects.filter(pk=job_id, status=Job.RUNNING).update(
+            locked_at=timezone.now()
+        )
+
+
+def _heartbeat_in_thread(job_id, stop):
+    try:
+        heartbeat(job_id, stop)
+    finally:
+        connection.close()
+
+
+@contextmanager
+def _locked(job_id):
+    """
+    Держать блокировку задачи, пока она выполняется.
+
+    Без этого долгую задачу release_stale вернул бы в очередь через
+    JOB_LOCK_TIMEOUT, и её выполнил бы второй исполнитель параллельно.
+    """
+    stop = threading.Event()
+    threading.Thread(
+        target=_heartbeat_in_thread, args=(job_id, stop), daemon=True,
+        name=f'job-{job_id}-heartbeat',
+    ).start()
+    try:
+        yield
+    finally:
+        stop.set()
+
+
+def execute(job_id):
+    """Выполнить взятую задачу: удалить при успехе, иначе отложить."""
+    job = Job.objects.get(pk=job_id)
+    try:
+        with _locked(job.pk):
+            import_string(job.func)(*json.loads(job.args))
+    except Exception:
+        logger.exception('Задача %s #%s завершилась ошибкой',
+                         job.func, job.pk)
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, last_error=error
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.PENDING,
+                last_error=error,
+                run_at=timezone.now() + timedelta(
+                    seconds=retry_delay(job.attempts)
+                ),
+            )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def run_job(job_id):
+    if claim(job_id):
+        execute(job_id)
+
+
+def _run_in_worker(job_id):
+    try:
+        run_job(job_id)
+    except Exception:
+        logger.exception('Не удалось выполнить задачу #%s', job_id)
+    finally:
+        connection.close()
+
+
+def release_stale():
+    """
+    Вернуть в очередь задачи, чей исполнитель пропал.
+
+    Задача, исчерпавшая попытки, помечается failed: иначе задачу,
+    которая роняет исполнителя, повторяли бы бесконечно.
+    """
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(
+            seconds=settings.JOB_LOCK_TIMEOUT
+        ),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_at=None,
+        last_error='Исполнитель пропал во время последней попытки.',
+    )
+    return stale.update(status=Job.PENDING, locked_at=None)
+
+
+def due(limit):
+    """Первичные ключи задач, которые пора выполнить."""
+    return list(Job.objects.filter(
+        status=Job.PENDING, run_at__lte=timezone.now()
+    ).order_by('run_at').values_list('pk', flat=True)[:limit])
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.prerender import prerender
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее отрисовывает страницы about и страницы ошибок в HTML, '
+        'который view отдают анонимам из памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.PRERENDERED_DIR,
+            help='Каталог для готовых страниц.',
+        )
+
+    def handle(self, *args, **options):
+        names = prerender(options['output'])
+        self.stdout.write(
+            f'Отрисовано страниц: {len(names)} в {options["output"]}'
+        )
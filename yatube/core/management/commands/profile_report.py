@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает самые медленные view и самые частые SQL: по заданным '
+        'адресам, замеренным в этом процессе, или по JSON, сохранённому '
+        'с /admin/profiling/.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Адреса для замера.')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument(
+            '--file', help='Отчёт, сохранённый с /admin/profiling/.'
+        )
+
+    def handle(self, *args, **options):
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as file:
+                data = json.load(file)
+        else:
+            profiling.clear()
+            client = Client()
+            with override_settings(PROFILING_SAMPLE_RATE=1):
+                for _ in range(options['repeat']):
+                    for path in options['paths']:
+                        client.get(path)
+            data = profiling.report(limit=options['limit'])
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Самые медленные view'))
+        for item in data['views']:
+            self.stdout.write(
+                '{view:<28} {requests:>5} req  p50 {p50_ms:>8.2f} ms  '
+                'p95 {p95_ms:>8.2f} ms  {queries:>5} SQL  '
+                'sql {sql_ms:>7.2f} ms  tpl {template_ms:>7.2f} ms'
+                .format(**item)
+            )
+        self.stdout.write(self.style.MIGRATE_HEADING('Самые частые SQL'))
+        for item in data['sql']:
+            self.stdout.write(
+                '{count:>6} (до {max_per_request} за запрос)  {sql}'
+                .format(**item)
+            )
+        self.stdout.write(
+            self.style.MIGRATE_HEADING('Переменные контекста')
+        )
+        # В отчётах, сохранённых до появления раздела, его нет.
+        for item in data.get('context', []):
+            self.stdout.write(
+                '{name:<40} {requests:>5} req  total {total_ms:>8.2f} ms  '
+                'avg {avg_ms:>7.2f} ms'.format(**item)
+            )
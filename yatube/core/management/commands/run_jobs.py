@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core import jobs
+
+
+def _execute(job_id):
+    try:
+        return jobs.execute(job_id)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в пуле потоков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Размер пула потоков; 0 - выполнять в основном потоке.',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза между опросами пустой очереди, с.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        pool = None
+        if workers:
+            pool = ThreadPoolExecutor(max_workers=workers,
+                                      thread_name_prefix='run_jobs')
+        done = failed = 0
+        try:
+            while True:
+                jobs.release_stale()
+                claimed = [job_id for job_id in jobs.due(max(workers, 1) * 2)
+                           if jobs.claim(job_id)]
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                if pool is None:
+                    results = [jobs.execute(job_id) for job_id in claimed]
+                else:
+                    futures = [pool.submit(_execute, job_id)
+                               for job_id in claimed]
+                    wait(futures)
+                    results = [future.result() for future in futures]
+                done += results.count(True)
+                failed += results.count(False)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {done}, с ошибкой: {failed}'
+        ))
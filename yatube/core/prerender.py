@@ -0,0 +1,81 @@
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils.html import escape
+
+# Вместо адреса запроса на странице 404; подставляется при отдаче.
+PATH_MARKER = '__prerendered_path__'
+
+# Имя страницы: шаблон и view, от имени которой она рисуется.
+PAGES = {
+    'about_author': ('about/author.html', 'about:author'),
+    'about_tech': ('about/tech.html', 'about:tech'),
+    '403': ('core/403.html', None),
+    '403csrf': ('core/403csrf.html', None),
+    '404': ('core/404.html', None),
+    '500': ('core/500.html', None),
+}
+
+
+def render_page(name):
+    """Отрисовать страницу так, как её увидит анонимный посетитель."""
+    template, view_name = PAGES[name]
+    url = reverse(view_name) if view_name else '/'
+    request = RequestFactory().get(url)
+    request.user = AnonymousUser()
+    request.resolver_match = resolve(url) if view_name else None
+    return render_to_string(template, {'path': PATH_MARKER}, request)
+
+
+def prerender(directory):
+    """Записать все страницы в directory и вернуть их имена."""
+    os.makedirs(directory, exist_ok=True)
+    for name in PAGES:
+        with open(os.path.join(directory, f'{name}.html'), 'w',
+                  encoding='utf-8') as file:
+            file.write(render_page(name))
+    _load.cache_clear()
+    return list(PAGES)
+
+
+@lru_cache(maxsize=None)
+def _load(directory, name):
+    try:
+        with open(os.path.join(directory, f'{name}.html'), 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def prerendered_response(name, status=200, path=None):
+    """
+    Ответ с заранее отрисованной страницей или None, если её нет.
+
+    Файл читается с диска один раз на процесс, дальше байты отдаются
+    из памяти: ни шаблонов, ни запросов к базе.
+    """
+    body = _load(settings.PRERENDERED_DIR, name)
+    if body is None:
+        return None
+    if path is not None:
+        body = body.replace(PATH_MARKER.encode(), escape(path).encode())
+    return HttpResponse(body, status=status)
+
+
+class PrerenderedMixin:
+    """Отдавать анонимам готовую страницу prerendered_name."""
+
+    prerendered_name = None
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            response = prerendered_response(self.prerendered_name)
+            if response is not None:
+                return response
+        return super().get(request, *args, **kwargs)
@@ -0,0 +1,191 @@
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+
+_local = threading.local()
+_lock = threading.Lock()
+_records = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+_original_render = Template.render
+MIDDLEWARE = 'core.profiling.ProfilingMiddleware'
+
+
+def _timed_render(self, context=None, request=None):
+    record = getattr(_local, 'record', None)
+    depth = getattr(_local, 'render_depth', 0)
+    # Вложенные отрисовки (карточки ленты внутри страницы) уже входят
+    # во время внешней: считаем только её.
+    if record is None or depth:
+        return _original_render(self, context, request)
+    _local.render_depth = 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        _local.render_depth = 0
+        record['template_ms'] += (time.perf_counter() - started) * 1000
+
+
+def install():
+    """
+    Замерять время шаблонов, если профилировщик включён.
+
+    Вызывается из CoreConfig.ready(): без ProfilingMiddleware в MIDDLEWARE
+    или при PROFILING_SAMPLE_RATE = 0 шаблоны Django не подменяются.
+    """
+    if MIDDLEWARE in settings.MIDDLEWARE and settings.PROFILING_SAMPLE_RATE:
+        Template.render = _timed_render
+
+
+def record_context(name, ms):
+    """Учесть вычисление ленивой переменной контекста в текущем замере."""
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record['context_ms'][name] += ms
+
+
+def records():
+    """Копия кольцевого буфера замеров."""
+    with _lock:
+        return list(_records)
+
+
+def clear():
+    with _lock:
+        _records.clear()
+
+
+class ProfilingMiddleware:
+    """
+    Замеряет выборку запросов: число и время SQL, время шаблонов и общее.
+
+    Доля замеряемых запросов задаётся PROFILING_SAMPLE_RATE, результаты
+    копятся в кольцевом буфере на PROFILING_BUFFER_SIZE записей.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        record = {
+            'queries': 0, 'sql_ms': 0.0, 'template_ms': 0.0, 'sql': Counter(),
+            'context_ms': Counter(),
+        }
+
+        def count_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                # Обёртка работает и в потоках core.fanout.
+                with _lock:
+                    record['sql_ms'] += elapsed
+                    record['queries'] += 1
+                    record['sql'][sql] += 1
+
+        _local.record = record
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(count_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.record = None
+        record['total_ms'] = (time.perf_counter() - started) * 1000
+        match = request.resolver_match
+        record['view'] = match.view_name if match else request.path
+        record['status'] = response.status_code
+        with _lock:
+            _records.append(record)
+        return response
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(percent / 100 * len(ordered))) - 1]
+
+
+def slowest_views(data, limit=10):
+    """Сводка по view, отсортированная по p95 общего времени."""
+    by_view = defaultdict(list)
+    for record in data:
+        by_view[record['view']].append(record)
+    summary = []
+    for view, items in by_view.items():
+        count = len(items)
+        summary.append({
+            'view': view,
+            'requests': count,
+            'p50_ms': round(_percentile(
+                [item['total_ms'] for item in items], 50), 3),
+            'p95_ms': round(_percentile(
+                [item['total_ms'] for item in items], 95), 3),
+            'queries': round(sum(item['queries'] for item in items) / count,
+                             1),
+            'sql_ms': round(sum(item['sql_ms'] for item in items) / count,
+                            3),
+            'template_ms': round(
+                sum(item['template_ms'] for item in items) / count, 3
+            ),
+        })
+    summary.sort(key=lambda item: item['p95_ms'], reverse=True)
+    return summary[:limit]
+
+
+def repeated_sql(data, limit=10):
+    """
+    Самые частые шаблоны SQL.
+
+    max_per_request больше единицы обычно означает N+1 во view.
+    """
+    total = Counter()
+    per_request = Counter()
+    for record in data:
+        for sql, count in record['sql'].items():
+            total[sql] += count
+            per_request[sql] = max(per_request[sql], count)
+    return [
+        {'sql': sql, 'count': count, 'max_per_request': per_request[sql]}
+        for sql, count in total.most_common(limit)
+    ]
+
+
+def context_costs(data, limit=10):
+    """
+    Цена ленивых переменных контекста, по убыванию общего времени.
+
+    requests - в скольких замеренных запросах шаблоны обратились
+    к переменной; остальные запросы её не вычисляли вовсе.
+    """
+    total = Counter()
+    used = Counter()
+    for record in data:
+        for name, ms in record.get('context_ms', {}).items():
+            total[name] += ms
+            used[name] += 1
+    return [
+        {'name': name, 'requests': used[name],
+         'total_ms': round(ms, 3), 'avg_ms': round(ms / used[name], 3)}
+        for name, ms in total.most_common(limit)
+    ]
+
+
+def report(data=None, limit=10):
+    data = records() if data is None else data
+    return {
+        'views': slowest_views(data, limit),
+        'sql': repeated_sql(data, limit),
+        'context': context_costs(data, limit),
+    }
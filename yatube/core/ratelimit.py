@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.shortcuts import render
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_lock = threading.Lock()
+# Ключ -> [токены, время последнего пополнения]; старые ключи вытесняются.
+_buckets = OrderedDict()
+_rejected = Counter()
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'10/m' -> (10, 60): не больше 10 запросов в минуту."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def _refill(key, count, refill, now):
+    """Корзина key, пополненная к моменту now; вызывать под _lock."""
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = [float(count), now]
+        if len(_buckets) > settings.RATELIMIT_MAX_KEYS:
+            _buckets.popitem(last=False)
+    else:
+        _buckets.move_to_end(key)
+        bucket[0] = min(count, bucket[0] + (now - bucket[1]) * refill)
+        bucket[1] = now
+    return bucket
+
+
+def take(keys, rate, now=None):
+    """
+    Взять по токену из корзин keys; вернуть 0 или секунды до токена.
+
+    Корзина вмещает count токенов и пополняется равномерно count токенами
+    за period, поэтому допускает всплеск до count запросов подряд.
+    Токены берутся, только если они есть во всех корзинах: отклонённый
+    запрос не тратит лимит остальных.
+    """
+    count, period = parse_rate(rate)
+    refill = count / period
+    now = time.monotonic() if now is None else now
+    with _lock:
+        buckets = [_refill(key, count, refill, now) for key in keys]
+        wait = max((1 - bucket[0]) / refill for bucket in buckets)
+        if wait > 0:
+            return wait
+        for bucket in buckets:
+            bucket[0] -= 1
+        return 0
+
+
+def client_ip(request):
+    """
+    Адрес клиента.
+
+    За доверенными прокси RATELIMIT_TRUSTED_PROXIES он берётся из
+    X-Forwarded-For: первый справа адрес, который не прокси. Заголовку
+    от остальных адресов не верим, иначе его подделкой обходят лимит.
+    """
+    trusted = settings.RATELIMIT_TRUSTED_PROXIES
+    addr = request.META.get('REMOTE_ADDR', '')
+    if addr not in trusted:
+        return addr
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    for hop in reversed(forwarded.split(',')):
+        hop = hop.strip()
+        if not hop:
+            break
+        addr = hop
+        if addr not in trusted:
+            break
+    return addr
+
+
+def client_keys(request, scope):
+    """Корзины запроса: по адресу и, если пользователь вошёл, по нему."""
+    keys = [f'{scope}:ip:{client_ip(request)}']
+    if request.user.is_authenticated:
+        keys.append(f'{scope}:user:{request.user.pk}')
+    return keys
+
+
+def stats():
+    """Число отклонённых запросов по областям."""
+    with _lock:
+        return dict(_rejected)
+
+
+def clear():
+    with _lock:
+        _buckets.clear()
+        _rejected.clear()
+
+
+def ratelimit(scope):
+    """
+    Ограничить изменяющие запросы к view лимитом RATE_LIMITS[scope].
+
+    Лимит действует отдельно на пользователя и на IP-адрес; корзины
+    живут в памяти процесса, так что проверка не ходит ни в базу, ни
+    в кэш. Сверх лимита отдаётся 429 с Retry-After.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            rate = settings.RATE_LIMITS.get(scope)
+            if rate is None or request.method in SAFE_METHODS:
+                return view(request, *args, **kwargs)
+            wait = take(client_keys(request, scope), rate)
+            if not wait:
+                return view(request, *args, **kwargs)
+            with _lock:
+                _rejected[scope] += 1
+            response = render(request, 'core/429.html', status=429)
+            response['Retry-After'] = str(int(wait) + 1)
+            return response
+        return wrapper
+    return decorator
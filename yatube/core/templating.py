@@ -0,0 +1,42 @@
+import logging
+import os
+
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(engine):
+    """Имена всех шаблонов, которые видят загрузчики движка."""
+    names = set()
+    loaders = []
+    for loader in engine.engine.template_loaders:
+        # Кэширующий загрузчик сам каталогов не знает.
+        loaders.extend(getattr(loader, 'loaders', [loader]))
+    for loader in loaders:
+        for directory in loader.get_dirs():
+            for root, _, files in os.walk(directory):
+                for filename in files:
+                    names.add(os.path.relpath(
+                        os.path.join(root, filename), directory
+                    ).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def warm_templates():
+    """
+    Скомпилировать все шаблоны заранее и вернуть их число.
+
+    С кэширующим загрузчиком первые запросы после старта процесса
+    не тратят время на чтение и разбор шаблонов.
+    """
+    count = 0
+    for engine in engines.all():
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                logger.warning('Шаблон %s не скомпилирован', name)
+                continue
+            count += 1
+    return count
@@ -1,4 +1,48 @@
-from django.test import TestCase
+import itertools
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.template import engines
+from django.http import Http404
+from django.template.backends.django import Template as DjangoTemplate
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Group, Post
+
+from . import checks, jobs, profiling, ratelimit, templating
+from .context_processors.lazy import daily, lazy_processor
+from .db import (STICKY_COOKIE, ReplicaRouter, read_replica,
+                 reading_from_replica)
+from .fanout import gather
+from .models import Job
+from .prerender import PATH_MARKER
+from .views import server_error
+
+User = get_user_model()
+CALLS = []
+
+
+def record_call(*args):
+    CALLS.append(args)
+
+
+def fail():
+    raise ValueError('Ошибка задачи')
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +50,618 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    def test_local_cache_warns_on_deploy(self):
+        """check --deploy требует общий для процессов кэш."""
+        warning, = checks.shared_cache(None)
+        self.assertEqual(warning.id, 'core.W001')
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cache',
+        }}
+        with override_settings(CACHES=shared):
+            self.assertEqual(checks.shared_cache(None), [])
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1)
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        profiling.clear()
+
+    def test_sampled_request_is_recorded(self):
+        """Замер содержит имя view, SQL, время шаблонов и общее время."""
+        self.client.get(reverse('posts:index'))
+        record, = profiling.records()
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['queries'], sum(record['sql'].values()))
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['template_ms'])
+
+    def test_nested_render_is_timed_once(self):
+        """Карточки, отрисованные внутри страницы, не считаются дважды."""
+        inner = engines['django'].from_string('карточка')
+
+        class Card:
+            def __str__(self):
+                return inner.render({})
+
+        outer = engines['django'].from_string('{{ card }}')
+        record = {'template_ms': 0.0}
+        profiling._local.record = record
+        self.addCleanup(setattr, profiling._local, 'record', None)
+        with mock.patch('core.profiling.time.perf_counter',
+                        side_effect=itertools.count()):
+            self.assertEqual(outer.render({'card': Card()}), 'карточка')
+        self.assertEqual(record['template_ms'], 1000)
+
+    def test_templates_are_patched_only_when_enabled(self):
+        """Без профилировщика отрисовка шаблонов Django не подменяется."""
+        original = profiling._original_render
+        with mock.patch.object(DjangoTemplate, 'render', original):
+            with override_settings(PROFILING_SAMPLE_RATE=0):
+                profiling.install()
+                self.assertIs(DjangoTemplate.render, original)
+            profiling.install()
+            self.assertIs(DjangoTemplate.render, profiling._timed_render)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_skipped(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(profiling.records(), [])
+
+    def test_report_is_staff_only(self):
+        """Отчёт профилировщика доступен только персоналу."""
+        client = Client()
+        client.force_login(User.objects.create_user(username='auth'))
+        url = reverse('profiling_report')
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        self.client.get(reverse('about:author'))
+        views = [item['view'] for item in client.get(url).json()['views']]
+        self.assertIn('about:author', views)
+
+    def test_report_ignores_bad_limit(self):
+        """Нечисловой или неположительный limit заменяется на 10."""
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        self.client.get(reverse('about:author'))
+        url = reverse('profiling_report')
+        for limit in ('abc', '0', '-1'):
+            response = self.client.get(url, {'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()['views'])
+
+    def test_repeated_sql_shows_queries_per_request(self):
+        """repeated_sql суммирует шаблоны и показывает максимум за запрос."""
+        data = [
+            {'sql': Counter({'SELECT a': 3, 'SELECT b': 1})},
+            {'sql': Counter({'SELECT a': 1})},
+        ]
+        self.assertEqual(profiling.repeated_sql(data), [
+            {'sql': 'SELECT a', 'count': 4, 'max_per_request': 3},
+            {'sql': 'SELECT b', 'count': 1, 'max_per_request': 1},
+        ])
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+        @read_replica
+        def view(request):
+            return self.router.db_for_read(Post)
+        self.view = view
+
+    def test_reads_outside_views_go_to_primary(self):
+        """Без read_replica чтение и запись идут в основную базу."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_one_replica_per_block(self):
+        """Все чтения блока идут в одну реплику, запись - в основную."""
+        with reading_from_replica():
+            replica = self.router.db_for_read(Post)
+            self.assertIn(replica, ('replica1', 'replica2'))
+            for _ in range(10):
+                self.assertEqual(self.router.db_for_read(Post), replica)
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_view_reads_from_replica(self):
+        self.assertIn(
+            self.view(self.factory.get('/')), ('replica1', 'replica2')
+        )
+        self.assertEqual(self.view(self.factory.post('/')), 'default')
+
+    def test_recent_writer_is_pinned_to_primary(self):
+        """После записи пользователь читает из основной базы."""
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = str(time.time() + 5)
+        self.assertEqual(self.view(request), 'default')
+        request.COOKIES[STICKY_COOKIE] = str(time.time() - 1)
+        self.assertIn(self.view(request), ('replica1', 'replica2'))
+
+    def test_migrations_run_on_primary_only(self):
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'],
+                   BACKGROUND_WORKERS=0)
+class ReplicaStandInTest(TransactionTestCase):
+    """Две реплики - отдельные соединения с той же тестовой SQLite."""
+    REPLICAS = ('replica1', 'replica2')
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for alias in cls.REPLICAS:
+            connections.databases[alias] = dict(
+                connections.databases['default']
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in cls.REPLICAS:
+            connections[alias].close()
+            delattr(connections._connections, alias)
+            del connections.databases[alias]
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='NoName')
+        self.post = Post.objects.create(author=self.user, text='Тестовый')
+        self.client.force_login(self.user)
+
+    def queries(self, method, url, data=None):
+        """
+        Число запросов к основной базе и к репликам.
+
+        Считает обёртка запросов, а не CaptureQueriesContext: её видят
+        и соединения потоков core.fanout.
+        """
+        counts = Counter()
+
+        def counter(alias):
+            def count(execute, sql, params, many, context):
+                counts[alias] += 1
+                return execute(sql, params, many, context)
+            return count
+
+        with ExitStack() as stack:
+            for alias in ('default', *self.REPLICAS):
+                stack.enter_context(
+                    connections[alias].execute_wrapper(counter(alias))
+                )
+            response = getattr(self.client, method)(url, data or {})
+        replica_queries = sum(counts[alias] for alias in self.REPLICAS)
+        return response, counts['default'], replica_queries
+
+    def test_read_views_use_replicas(self):
+        for url in (reverse('posts:index'),
+                    reverse('posts:post_detail', args=[self.post.pk]),
+                    reverse('about:author')):
+            with self.subTest(url=url):
+                response, primary, replicas = self.queries('get', url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(primary, 0)
+                self.assertGreater(replicas, 0)
+
+    def test_write_pins_reads_to_primary(self):
+        """Комментарий пишется в основную базу и читается оттуда же."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response, primary, replicas = self.queries(
+            'post', reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replicas, 0)
+        response, primary, replicas = self.queries('get', url)
+        self.assertContains(response, 'Комментарий')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replicas, 0)
+
+    @override_settings(READ_FANOUT_WORKERS=2)
+    def test_pinned_fanout_reads_stay_on_primary(self):
+        """Параллельные чтения закреплённого запроса не идут в реплики."""
+        self.client.post(reverse('posts:add_comment', args=[self.post.pk]),
+                         {'text': 'Комментарий'})
+        for url in (reverse('posts:profile', args=[self.user.username]),
+                    reverse('posts:post_detail', args=[self.post.pk])):
+            with self.subTest(url=url):
+                response, primary, replicas = self.queries('get', url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(replicas, 0)
+
+    @override_settings(READ_FANOUT_WORKERS=2)
+    def test_fanout_outside_views_reads_primary(self):
+        threads = []
+
+        def observe(execute, sql, params, many, context):
+            threads.append(threading.current_thread().name)
+            return execute(sql, params, many, context)
+
+        def read():
+            return list(User.objects.values_list('pk', flat=True))
+
+        with ExitStack() as stack:
+            for alias in self.REPLICAS:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(observe)
+                )
+            gather(read, read, read)
+        self.assertEqual(threads, [])
+
+
+class RateLimitTest(TestCase):
+    def setUp(self):
+        ratelimit.clear()
+        self.user = User.objects.create_user(username='NoName')
+        self.post = Post.objects.create(author=self.user, text='Тестовый')
+        self.client.force_login(self.user)
+        self.url = reverse('posts:add_comment', args=[self.post.pk])
+
+    def test_bucket_refills_over_time(self):
+        """Корзина допускает всплеск и пополняется равномерно."""
+        self.assertEqual(ratelimit.take(['key'], '2/m', now=0), 0)
+        self.assertEqual(ratelimit.take(['key'], '2/m', now=0), 0)
+        self.assertEqual(ratelimit.take(['key'], '2/m', now=0), 30)
+        self.assertEqual(ratelimit.take(['key'], '2/m', now=30), 0)
+
+    def test_rejected_request_keeps_other_tokens(self):
+        """Отказ одной корзины не тратит токены остальных."""
+        ratelimit.take(['ip'], '1/m', now=0)
+        self.assertEqual(ratelimit.take(['ip', 'user'], '1/m', now=0), 60)
+        self.assertEqual(ratelimit.take(['user'], '1/m', now=0), 0)
+
+    @override_settings(RATE_LIMITS={'add_comment': '2/m'})
+    def test_requests_over_limit_are_rejected(self):
+        """Сверх лимита view не вызывается, отказ учитывается."""
+        for _ in range(2):
+            self.client.post(self.url, {'text': 'Комментарий'})
+        response = self.client.post(self.url, {'text': 'Комментарий'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.post.comments.count(), 2)
+        self.assertEqual(ratelimit.stats(), {'add_comment': 1})
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.client.get(reverse('ratelimit_stats'))
+        self.assertEqual(response.json(), {'add_comment': 1})
+
+    @override_settings(RATE_LIMITS={'add_comment': '2/m'})
+    def test_ip_limit_covers_all_users(self):
+        """Лимит по IP действует на всех пользователей с этого адреса."""
+        for _ in range(2):
+            self.client.post(self.url, {'text': 'Комментарий'})
+        other = Client()
+        other.force_login(User.objects.create_user(username='Other'))
+        response = other.post(self.url, {'text': 'Комментарий'})
+        self.assertEqual(response.status_code, 429)
+        response = other.post(
+            self.url, {'text': 'Комментарий'}, REMOTE_ADDR='10.0.0.2'
+        )
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=['10.0.0.1'])
+    def test_client_ip_behind_trusted_proxy(self):
+        """X-Forwarded-For учитывается только от доверенного прокси."""
+        factory = RequestFactory()
+        request = factory.get('/', REMOTE_ADDR='10.0.0.1',
+                              HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2')
+        self.assertEqual(ratelimit.client_ip(request), '2.2.2.2')
+        request = factory.get('/', REMOTE_ADDR='10.0.0.1',
+                              HTTP_X_FORWARDED_FOR='2.2.2.2, 10.0.0.1')
+        self.assertEqual(ratelimit.client_ip(request), '2.2.2.2')
+        request = factory.get('/', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(ratelimit.client_ip(request), '10.0.0.1')
+        request = factory.get('/', REMOTE_ADDR='3.3.3.3',
+                              HTTP_X_FORWARDED_FOR='2.2.2.2')
+        self.assertEqual(ratelimit.client_ip(request), '3.3.3.3')
+
+    @override_settings(RATE_LIMITS={'signup': '1/h'})
+    def test_signup_is_limited_and_get_is_not(self):
+        url = reverse('users:signup')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.post(url, {})
+        self.assertEqual(self.client.post(url, {}).status_code, 429)
+
+    def test_check_takes_microseconds(self):
+        started = time.perf_counter()
+        for number in range(1000):
+            ratelimit.take([f'key{number % 10}'], '1000/s')
+        self.assertLess((time.perf_counter() - started) / 1000, 1e-4)
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def run_jobs(self):
+        out = StringIO()
+        call_command('run_jobs', once=True, workers=0, stdout=out)
+        return out.getvalue()
+
+    def test_worker_runs_and_removes_job(self):
+        """run_jobs выполняет задачу с аргументами и удаляет её."""
+        job = jobs.enqueue(record_call, 1, 'два')
+        self.assertEqual(job.func, 'core.tests.record_call')
+        self.assertIn('Выполнено задач: 1', self.run_jobs())
+        self.assertEqual(CALLS, [(1, 'два')])
+        self.assertFalse(Job.objects.exists())
+
+    def test_rolled_back_job_is_not_queued(self):
+        """Задача из отменённой транзакции не попадает в очередь."""
+        with self.assertRaises(ValueError), transaction.atomic():
+            jobs.enqueue(record_call, 1)
+            raise ValueError
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_DELAY=10)
+    def test_failed_job_is_retried_with_backoff(self):
+        """Ошибка откладывает задачу, после всех попыток она failed."""
+        job = jobs.enqueue(fail)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertIn('с ошибкой: 1', self.run_jobs())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('Ошибка задачи', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=9))
+        self.assertIn('Выполнено задач: 0, с ошибкой: 0', self.run_jobs())
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    @override_settings(JOB_RETRY_DELAY=10, JOB_RETRY_MAX_DELAY=60)
+    def test_retry_delay_doubles_up_to_limit(self):
+        self.assertEqual(
+            [jobs.retry_delay(attempt) for attempt in range(1, 6)],
+            [10, 20, 40, 60, 60],
+        )
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_stale_job_is_released(self):
+        """Задачу пропавшего исполнителя выполняет следующий."""
+        job = jobs.enqueue(record_call, 'снова')
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING,
+            locked_at=timezone.now() - timedelta(minutes=5),
+        )
+        self.run_jobs()
+        self.assertEqual(CALLS, [('снова',)])
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_stale_job_without_attempts_fails(self):
+        """Задача, ронявшая исполнителя все попытки, больше не берётся."""
+        job = jobs.enqueue(record_call, 'снова')
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, attempts=job.max_attempts,
+            locked_at=timezone.now() - timedelta(minutes=5),
+        )
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(CALLS, [])
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_heartbeat_keeps_running_job_locked(self):
+        """Пока задача выполняется, её блокировка продлевается."""
+        job = jobs.enqueue(record_call)
+        stale = timezone.now() - timedelta(minutes=5)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, locked_at=stale
+        )
+        stop = mock.Mock()
+        stop.wait.side_effect = [False, True]
+        jobs.heartbeat(job.pk, stop)
+        stop.wait.assert_called_with(20)
+        self.assertEqual(jobs.release_stale(), 0)
+        job.refresh_from_db()
+        self.assertGreater(job.locked_at, stale)
+
+    def test_claimed_job_is_not_taken_twice(self):
+        job = jobs.enqueue(record_call)
+        self.assertTrue(jobs.claim(job.pk))
+        self.assertFalse(jobs.claim(job.pk))
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class JobAfterCommitTest(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_job_runs_right_after_commit(self):
+        """Без пула задача выполняется сразу после коммита."""
+        with transaction.atomic():
+            jobs.enqueue(record_call, 'после коммита')
+            self.assertEqual(CALLS, [])
+        self.assertEqual(CALLS, [('после коммита',)])
+        self.assertFalse(Job.objects.exists())
+
+
+class TemplateWarmupTest(TestCase):
+    @override_settings(TEMPLATES=[{
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [settings.TEMPLATE_DIR],
+        'OPTIONS': {'loaders': [(
+            'django.template.loaders.cached.Loader',
+            settings.TEMPLATE_LOADERS,
+        )]},
+    }])
+    def test_warm_templates_fills_cache(self):
+        """Прогрев компилирует шаблоны проекта и приложений заранее."""
+        self.assertGreater(templating.warm_templates(), 0)
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertIn('posts/index.html', loader.get_template_cache)
+        self.assertIn('admin/base.html', loader.get_template_cache)
+
+
+class LazyContextTest(TestCase):
+    def setUp(self):
+        self.calls = []
+
+        @lazy_processor
+        def processor(request):
+            return {'value': self.record_value}
+        self.processor = processor
+        self.request = RequestFactory().get('/')
+
+    def record_value(self, request):
+        self.calls.append(request)
+        return 'значение'
+
+    def render(self, source):
+        context = self.processor(self.request)
+        return engines['django'].from_string(source).render(context)
+
+    def test_value_computed_on_read_once_per_request(self):
+        """Значение вычисляется при чтении и один раз на запрос."""
+        self.render('без переменных')
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.render('{{ value }}'), 'значение')
+        self.assertEqual(self.render('{{ value }} {{ value }}'),
+                         'значение значение')
+        self.assertEqual(self.calls, [self.request])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_cost_in_profiling_report(self):
+        """Профилировщик показывает, сколько стоила переменная."""
+        profiling.clear()
+        self.client.get(reverse('about:author'))
+        names = [item['name'] for item in profiling.report()['context']]
+        self.assertIn('core.context_processors.year.year.year', names)
+
+    def test_cost_in_profile_report_command(self):
+        """profile_report печатает раздел переменных контекста."""
+        out = StringIO()
+        call_command('profile_report', reverse('about:author'), repeat=1,
+                     stdout=out)
+        self.assertIn('Переменные контекста', out.getvalue())
+        self.assertIn('core.context_processors.year.year.year',
+                      out.getvalue())
+
+    def test_daily_value_expires_at_midnight(self):
+        """daily пересчитывает значение после местной полуночи."""
+        counter = iter(range(10))
+        value = daily(lambda: next(counter))
+        self.assertEqual((value(), value()), (0, 0))
+        tomorrow = time.time() + 86400
+        with mock.patch('core.context_processors.lazy.time.time',
+                        return_value=tomorrow):
+            self.assertEqual(value(), 1)
+
+
+class PrerenderedPagesTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_override = override_settings(PRERENDERED_DIR=directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('prerender_pages', stdout=StringIO())
+
+    def test_anonymous_gets_prerendered_pages(self):
+        """Анонимы получают готовые страницы без рендера шаблонов."""
+        cases = (
+            (reverse('about:author'), 200, 'about/author.html'),
+            ('/missing/<script>/', 404, 'core/404.html'),
+        )
+        for url, status, template in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertTemplateNotUsed(response, template)
+                self.assertContains(response, 'Copyright', status_code=status)
+        self.assertContains(
+            response, '/missing/&lt;script&gt;/', status_code=404
+        )
+        self.assertNotContains(response, PATH_MARKER, status_code=404)
+
+    def test_authenticated_user_gets_full_render(self):
+        """Вошедший пользователь видит страницу со своей шапкой."""
+        self.client.force_login(User.objects.create_user(username='auth'))
+        response = self.client.get('/missing/')
+        self.assertTemplateUsed(response, 'core/404.html')
+        self.assertContains(response, 'auth', status_code=404)
+
+    def test_server_error_served_from_memory(self):
+        """Страница 500 отдаётся из памяти, не трогая сессию."""
+        request = RequestFactory().get('/')
+        response = server_error(request)
+        self.assertEqual(response.status_code, 500)
+        self.assertContains(response, 'Custom 500', status_code=500)
+
+
+@override_settings(READ_FANOUT_WORKERS=2)
+class FanoutTest(SimpleTestCase):
+    def test_calls_run_in_pool_in_order(self):
+        """Чтения идут в разных потоках, результаты - в порядке вызовов."""
+        threads = gather(
+            lambda: threading.current_thread().name,
+            lambda: threading.current_thread().name,
+        )
+        self.assertEqual(threads[0], threading.current_thread().name)
+        self.assertTrue(threads[1].startswith('reads'))
+
+    @override_settings(READ_FANOUT_WORKERS=0)
+    def test_disabled_fanout_runs_sequentially(self):
+        threads = gather(lambda: threading.get_ident(),
+                         lambda: threading.get_ident())
+        self.assertEqual(threads, [threading.get_ident()] * 2)
+
+    def test_errors_propagate(self):
+        """Ошибка чтения из пула доходит до view."""
+        def missing():
+            raise Http404
+        with self.assertRaises(Http404):
+            gather(lambda: 1, missing)
+
+
+@override_settings(READ_FANOUT_WORKERS=2)
+class FanoutViewsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_profiler_counts_pool_queries(self):
+        """Запросы из пула попадают в замер профилировщика."""
+        Group.objects.create(title='Группа', slug='group')
+        self.client.force_login(User.objects.create_user(username='auth'))
+        url = reverse('posts:group_posts', args=['group'])
+        counts = []
+        for workers in (0, 8):
+            with self.subTest(workers=workers), override_settings(
+                READ_FANOUT_WORKERS=workers
+            ):
+                profiling.clear()
+                self.client.get(url)
+                record, = profiling.records()
+                counts.append(record['queries'])
+        self.assertEqual(counts[0], counts[1])
+
+    def test_profile_reads_concurrently(self):
+        """Профиль, собранный из параллельных чтений, полон."""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=author, text='Пост автора')
+        self.client.force_login(reader)
+        self.client.get(reverse('posts:profile_follow', args=['author']))
+        response = self.client.get(reverse('posts:profile', args=['author']))
+        self.assertEqual(response.context['author'], author)
+        self.assertTrue(response.context['following'])
+        self.assertContains(response, 'Пост автора')
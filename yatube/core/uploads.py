@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """
+    Бросить приём файла, как только он превысит UPLOAD_MAX_BYTES.
+
+    Стоит первым в FILE_UPLOAD_HANDLERS: куски проходят через него
+    к обработчикам, которые пишут файл в память или во временный файл,
+    поэтому слишком большой файл обрывается на первом лишнем куске,
+    а не ложится на диск целиком. Имена отброшенных полей отдаёт
+    oversized_fields.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            rejected = getattr(self.request, 'oversized_uploads', set())
+            rejected.add(self.field_name)
+            self.request.oversized_uploads = rejected
+            raise SkipFile
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def oversized_fields(request):
+    """Поля запроса, файлы которых отброшены из-за размера."""
+    request.FILES  # Разбирает тело запроса, если его ещё не разбирали.
+    return getattr(request, 'oversized_uploads', set())
@@ -1,19 +1,59 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import profiling, ratelimit
+from .prerender import prerendered_response
+
+
+def _prerendered(request, name, status=200, path=None):
+    """Готовая страница для анонима; вошедшим нужна своя шапка."""
+    if request.user.is_authenticated:
+        return None
+    return prerendered_response(name, status, path)
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию;
     # выводить её в шаблон пользовательской страницы 404 мы не станем
-    return render(request, 'core/404.html', {'path': request.path}, status=404)
+    return _prerendered(request, '404', 404, request.path) or render(
+        request, 'core/404.html', {'path': request.path}, status=404
+    )
 
 
 def csrf_failure(request, reason=''):
-    return render(request, 'core/403csrf.html')
+    return _prerendered(request, '403csrf') or render(
+        request, 'core/403csrf.html'
+    )
 
 
 def server_error(request):
-    return render(request, 'core/500.html', status=500)
+    # Страница 500 одна для всех: при падении базы не стоит трогать
+    # сессию ради шапки.
+    return prerendered_response('500', 500) or render(
+        request, 'core/500.html', status=500
+    )
 
 
 def permission_denied(request, exception):
-    return render(request, 'core/403.html', status=403)
+    return _prerendered(request, '403', 403) or render(
+        request, 'core/403.html', status=403
+    )
+
+
+@staff_member_required
+def profiling_report(request):
+    """Самые медленные view и самые частые SQL из буфера профилировщика."""
+    try:
+        limit = int(request.GET.get('limit', 10))
+    except ValueError:
+        limit = 10
+    if limit < 1:
+        limit = 10
+    return JsonResponse(profiling.report(limit=limit))
+
+
+@staff_member_required
+def ratelimit_stats(request):
+    """Число отклонённых лимитом запросов по областям."""
+    return JsonResponse(ratelimit.stats())
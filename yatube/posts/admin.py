@@ -1,15 +1,212 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
 
-from .models import Group, Post
+from . import moderation
+from .models import Comment, Follow, Group, Post
+from .utils import CURSOR_PARAM, CursorPaginator
+
+
+class CappedCount(int):
+    """Число строк, которое считалось только до предела: «1000+»."""
+
+    def __str__(self):
+        return f'{int(self)}+'
+
+
+class CursorChangeList(ChangeList):
+    """
+    Список админки с keyset-пагинацией по cursor_key модели.
+
+    Любая страница выбирается условием на ключ, а не OFFSET, а строки
+    считаются не дальше count_limit, поэтому список на сотни тысяч
+    строк открывается так же быстро, как на сотню.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_PARAM)
+        super().__init__(request, *args, **kwargs)
+        # Ссылки фильтров, поиска и сортировки ведут на первую страницу.
+        self.params.pop(CURSOR_PARAM, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_PARAM, None)
+        return lookup_params
+
+    def get_results(self, request):
+        model_admin = self.model_admin
+        paginator = CursorPaginator(
+            self.queryset, self.list_per_page, key=model_admin.cursor_key
+        )
+        page = paginator.page(self.cursor)
+        limit = model_admin.count_limit
+        count = self.queryset.order_by()[:limit + 1].count()
+
+        self.result_count = count if count <= limit else CappedCount(limit)
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = page.has_next() or page.has_previous()
+        self.paginator = paginator
+        self.next_url = page.has_next() and self.get_query_string(
+            {CURSOR_PARAM: page.next_cursor}
+        )
+        self.previous_url = page.has_previous() and self.get_query_string(
+            {CURSOR_PARAM: page.previous_cursor}
+        )
+
+
+class GroupSlugFilter(admin.SimpleListFilter):
+    """
+    Фильтр по группе полем ввода slug.
+
+    Стандартный фильтр по внешнему ключу выводит в боковую панель
+    все группы, а их десятки тысяч.
+    """
+
+    title = 'группе (slug)'
+    parameter_name = 'group'
+    template = 'admin/posts/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        # Фильтр без вариантов не выводится; поле ввода их заменяет.
+        return [(None, '')]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(group__slug=self.value())
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.parameter_name]
+            ),
+            'params': [
+                (name, value) for name, value in changelist.params.items()
+                if name != self.parameter_name
+            ],
+        }
+
+
+class ModerationActionForm(ActionForm):
+    # Номер группы с поиском во всплывающем окне, а не <select> из всех
+    # групп на каждой странице списка.
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа',
+        widget=ForeignKeyRawIdWidget(
+            Post._meta.get_field('group').remote_field, admin.site
+        ),
+    )
+
+
+class ModerationAdmin(admin.ModelAdmin):
+    """
+    Админка большой таблицы: курсорный список и фоновые действия.
+
+    Действия только ставят в очередь задачи posts.moderation пачками
+    по MODERATION_CHUNK_SIZE, поэтому «выбрать все» на сотню тысяч
+    строк не упирается в таймаут запроса. Стандартное удаление
+    выключено: оно загружает все выбранные строки в страницу
+    подтверждения.
+    """
+
+    cursor_key = ('pk',)
+    count_limit = 1000
+    change_list_template = 'admin/posts/cursor_change_list.html'
+    show_full_result_count = False
+    sortable_by = ()
+    empty_value_display = '-пусто-'
+
+    def get_changelist(self, request, **kwargs):
+        return CursorChangeList
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def queue(self, request, func, queryset, *args):
+        total = moderation.enqueue_chunks(func, queryset, *args)
+        self.message_user(
+            request, f'Поставлено в очередь строк: {total}.', messages.SUCCESS
+        )
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
-    list_editable = ('group',)
+class PostAdmin(ModerationAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'hidden')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date', 'group')
-    empty_value_display = '-пусто-'
+    list_filter = ('pub_date', GroupSlugFilter, 'hidden')
+    raw_id_fields = ('author', 'group')
+    action_form = ModerationActionForm
+    actions = ('delete_posts', 'hide_posts', 'show_posts', 'move_posts')
+
+    def delete_posts(self, request, queryset):
+        self.queue(request, moderation.delete_posts, queryset)
+    delete_posts.short_description = 'Удалить выбранные посты'
+    delete_posts.allowed_permissions = ('delete',)
+
+    def hide_posts(self, request, queryset):
+        self.queue(request, moderation.hide_posts, queryset, True)
+    hide_posts.short_description = 'Скрыть выбранные посты'
+    hide_posts.allowed_permissions = ('change',)
+
+    def show_posts(self, request, queryset):
+        self.queue(request, moderation.hide_posts, queryset, False)
+    show_posts.short_description = 'Вернуть выбранные посты'
+    show_posts.allowed_permissions = ('change',)
+
+    def move_posts(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid() or form.cleaned_data['group'] is None:
+            self.message_user(
+                request, 'Выберите группу для переноса.', messages.ERROR
+            )
+            return
+        self.queue(request, moderation.move_posts, queryset,
+                   form.cleaned_data['group'].pk)
+    move_posts.short_description = 'Перенести выбранные посты в группу'
+    move_posts.allowed_permissions = ('change',)
+
+
+@admin.register(Comment)
+class CommentAdmin(ModerationAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post', 'hidden')
+    list_select_related = ('author', 'post')
+    search_fields = ('text',)
+    list_filter = ('created', 'hidden')
+    raw_id_fields = ('author', 'post')
+    actions = ('delete_comments', 'hide_comments', 'show_comments')
+
+    def get_readonly_fields(self, request, obj=None):
+        # Счётчики комментариев следуют только за созданием и удалением.
+        if obj is not None:
+            return ('post', 'author')
+        return ()
+
+    def delete_comments(self, request, queryset):
+        self.queue(request, moderation.delete_comments, queryset)
+    delete_comments.short_description = 'Удалить выбранные комментарии'
+    delete_comments.allowed_permissions = ('delete',)
+
+    def hide_comments(self, request, queryset):
+        self.queue(request, moderation.hide_comments, queryset, True)
+    hide_comments.short_description = 'Скрыть выбранные комментарии'
+    hide_comments.allowed_permissions = ('change',)
+
+    def show_comments(self, request, queryset):
+        self.queue(request, moderation.hide_comments, queryset, False)
+    show_comments.short_description = 'Вернуть выбранные комментарии'
+    show_comments.allowed_permissions = ('change',)
 
 
 @admin.register(Group)
@@ -17,5 +214,11 @@ class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
     list_editable = ('title', 'description')
     search_fields = ('title',)
-    list_filter = ('title', 'description')
     empty_value_display = '-пусто-'
+
+
+@admin.register(Follow)
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author')
+    search_fields = ('user__username', 'author__username')
+    raw_id_fields = ('user', 'author')
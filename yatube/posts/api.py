@@ -0,0 +1,162 @@
+import hashlib
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (HttpResponse, HttpResponseNotModified,
+                         JsonResponse, StreamingHttpResponse)
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+
+from .models import Group, Post
+from .utils import comments_paginator, paginator
+
+User = get_user_model()
+
+EXPORT_CHUNK = 500
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date,
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group else None,
+    'image': lambda post: post.thumbnail_url or None,
+    'comments_count': lambda post: post.comments_count,
+    'url': lambda post: reverse('posts:post_detail', args=[post.pk]),
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: comment.created,
+}
+
+
+class FieldsError(ValueError):
+    """В ?fields= запрошены поля, которых нет у ресурса."""
+
+
+def requested_fields(request, available):
+    """Поля из ?fields=a,b в порядке запроса; без параметра - все."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown or not names:
+        raise FieldsError(', '.join(unknown))
+    return names
+
+
+def serialize(obj, fields, available):
+    return {name: available[name](obj) for name in fields}
+
+
+def fields_error(error):
+    return JsonResponse(
+        {'error': f'Неизвестные поля: {error}'}, status=400
+    )
+
+
+def page_response(request, data):
+    """
+    JSON-ответ с ETag по содержимому.
+
+    Совпавший If-None-Match возвращает 304 без тела: клиент не качает
+    и не разбирает страницу повторно.
+    """
+    body = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+    etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+def posts_page(request, post_list):
+    try:
+        fields = requested_fields(request, POST_FIELDS)
+    except FieldsError as error:
+        return fields_error(error)
+    page_obj = paginator(request, post_list)
+    return page_response(request, {
+        'results': [serialize(post, fields, POST_FIELDS)
+                    for post in page_obj],
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+    })
+
+
+@require_safe
+def index(request):
+    """Лента всех постов, как на главной странице."""
+    return posts_page(request, Post.objects.feed())
+
+
+@require_safe
+def group_posts(request, slug):
+    """Посты группы, как на странице группы."""
+    group = get_object_or_404(Group, slug=slug)
+    return posts_page(request, group.posts.feed())
+
+
+@require_safe
+def profile(request, username):
+    """Посты автора, как в его профиле."""
+    author = get_object_or_404(User, username=username)
+    return posts_page(request, author.posts.feed())
+
+
+@require_safe
+def post_comments(request, post_id):
+    """Комментарии поста, как под постом на его странице."""
+    try:
+        fields = requested_fields(request, COMMENT_FIELDS)
+    except FieldsError as error:
+        return fields_error(error)
+    post = get_object_or_404(Post.objects.visible().only('pk'), pk=post_id)
+    comments = comments_paginator(request, post)
+    return page_response(request, {
+        'results': [serialize(comment, fields, COMMENT_FIELDS)
+                    for comment in comments],
+        'next_cursor': comments.next_cursor,
+        'previous_cursor': comments.previous_cursor,
+    })
+
+
+@require_safe
+def export_posts(request):
+    """
+    Все посты потоком NDJSON, по строке на пост.
+
+    Посты читаются итератором пачками, поэтому ни сервер, ни клиент
+    не держат всю выгрузку в памяти. ?group= и ?author= сужают выборку.
+    """
+    try:
+        fields = requested_fields(request, POST_FIELDS)
+    except FieldsError as error:
+        return fields_error(error)
+    post_list = Post.objects.feed().order_by('-pub_date', '-pk')
+    if request.GET.get('group'):
+        post_list = post_list.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        post_list = post_list.filter(
+            author__username=request.GET['author']
+        )
+
+    def lines():
+        for post in post_list.iterator(chunk_size=EXPORT_CHUNK):
+            yield json.dumps(
+                serialize(post, fields, POST_FIELDS),
+                cls=DjangoJSONEncoder, ensure_ascii=False,
+            ) + '\n'
+
+    return StreamingHttpResponse(
+        lines(), content_type='application/x-ndjson'
+    )
@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.index, name='index'),
+    path('posts/export/', api.export_posts, name='export_posts'),
+    path('groups/<slug:slug>/posts/', api.group_posts, name='group_posts'),
+    path('profile/<str:username>/posts/', api.profile, name='profile'),
+    path(
+        'posts/<int:post_id>/comments/',
+        api.post_comments,
+        name='post_comments'
+    ),
+]
@@ -0,0 +1,214 @@
+import math
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .cards import render_cards
+from .management.commands.rebuild_counters import rebuild_counters
+from .models import Comment, Group, Post
+from .thumbnails import generate_thumbnail
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def _bulk_create(model, objects):
+    """Создать строки пачками, не держа весь набор в памяти."""
+    objects = iter(objects)
+    while True:
+        chunk = list(islice(objects, BATCH_SIZE))
+        if not chunk:
+            return
+        model.objects.bulk_create(chunk)
+
+
+def seed(users=20, groups=5, posts=1000, comments=2000, images=10):
+    """
+    Заполнить базу данными для замера и вернуть объекты для запросов.
+
+    Строки создаются пачками через bulk_create, поэтому счётчики и
+    миниатюры после этого пересчитываются отдельно.
+    """
+    _bulk_create(User, (
+        User(username=f'bench_user_{number}', password='!')
+        for number in range(users)
+    ))
+    author_ids = list(User.objects.filter(
+        username__startswith='bench_user_'
+    ).values_list('pk', flat=True))
+    _bulk_create(Group, (
+        Group(title=f'Группа {number}', slug=f'bench-group-{number}',
+              description='Описание группы') for number in range(groups)
+    ))
+    group_ids = list(Group.objects.filter(
+        slug__startswith='bench-group-'
+    ).values_list('pk', flat=True)) or [None]
+    image_names = [
+        default_storage.save(f'posts/bench_{number}.gif',
+                             ContentFile(SMALL_GIF))
+        for number in range(images)
+    ]
+    _bulk_create(Post, (
+        Post(text=f'Тестовый пост {number}\nвторая строка',
+             author_id=author_ids[number % len(author_ids)],
+             group_id=group_ids[number % len(group_ids)],
+             image=image_names[number] if number < images else '')
+        for number in range(posts)
+    ))
+    post_ids = list(Post.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    )[:posts])
+    _bulk_create(Comment, (
+        Comment(text=f'Комментарий {number}',
+                post_id=post_ids[number % len(post_ids)],
+                author_id=author_ids[number % len(author_ids)])
+        for number in range(comments)
+    ))
+    rebuild_counters()
+    pending = Post.objects.filter(
+        thumbnail_url=''
+    ).exclude(image='').values_list('pk', 'image')
+    for post_id, image_name in pending.iterator():
+        generate_thumbnail(post_id, image_name)
+    return {
+        'author': User.objects.get(pk=author_ids[0]),
+        'group': Group.objects.filter(pk=group_ids[0]).first(),
+        'post': Post.objects.get(pk=post_ids[0]),
+    }
+
+
+def scenarios(dataset):
+    """Сценарии замера: имя, метод, адрес, данные формы, нужен ли вход."""
+    author, group, post = (
+        dataset['author'], dataset['group'], dataset['post']
+    )
+    result = [
+        ('index', 'get', reverse('posts:index'), None, False),
+        ('profile', 'get',
+         reverse('posts:profile', args=[author.username]), None, False),
+        ('post_detail', 'get',
+         reverse('posts:post_detail', args=[post.pk]), None, False),
+        ('post_create', 'post', reverse('posts:post_create'),
+         {'text': 'Новый пост'}, True),
+        ('add_comment', 'post',
+         reverse('posts:add_comment', args=[post.pk]),
+         {'text': 'Новый комментарий'}, True),
+    ]
+    if group is not None:
+        result.insert(1, ('group_posts', 'get',
+                          reverse('posts:group_posts', args=[group.slug]),
+                          None, False))
+    return result
+
+
+def percentile(values, percent):
+    """Значение перцентиля методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def run(dataset, repeat=20, cold=False):
+    """
+    Прогнать сценарии через тестовый клиент и вернуть метрики.
+
+    cold очищает кэш перед каждым запросом, чтобы мерить полный путь
+    через ORM и шаблоны, а не страничный кэш. Лимиты частоты запросов
+    на время замера отключены: иначе повторы post_create получали бы 429.
+    SQL считается отдельным запросом без кэша и без core.fanout: запросы
+    из потоков пула не попали бы в CaptureQueriesContext.
+    """
+    with override_settings(RATE_LIMITS={}):
+        return _run(dataset, repeat, cold)
+
+
+def _run(dataset, repeat, cold):
+    guest_client = Client()
+    authorized_client = Client()
+    authorized_client.force_login(dataset['author'])
+    results = {}
+    for name, method, url, data, login in scenarios(dataset):
+        client = authorized_client if login else guest_client
+        cache.clear()
+        # Иначе начало замера указывает в журнал, который запрос очистит.
+        reset_queries()
+        with override_settings(READ_FANOUT_WORKERS=0), \
+                CaptureQueriesContext(connection) as captured:
+            getattr(client, method)(url, data)
+        queries = len(captured)
+        timings, sizes = [], []
+        for _ in range(repeat):
+            if cold:
+                cache.clear()
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            timings.append((time.perf_counter() - started) * 1000)
+            sizes.append(len(response.content))
+        results[name] = {
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'queries': queries,
+            'bytes': max(sizes),
+        }
+    return results
+
+
+def card_render(repeat=20):
+    """
+    Время отрисовки карточки в пересчёте на пост, мс.
+
+    cold - фрагменты рендерятся шаблоном, warm - берутся из кэша.
+    """
+    posts = list(Post.objects.feed().order_by('-pub_date', '-pk')[
+        :settings.POST_PER_PAGE
+    ])
+    results = {}
+    for mode in ('cold', 'warm'):
+        timings = []
+        for _ in range(repeat):
+            if mode == 'cold':
+                cache.clear()
+            started = time.perf_counter()
+            render_cards(posts)
+            timings.append(
+                (time.perf_counter() - started) * 1000 / max(len(posts), 1)
+            )
+        results[mode] = {
+            'p50_ms': round(percentile(timings, 50), 4),
+            'p95_ms': round(percentile(timings, 95), 4),
+        }
+    return results
+
+
+def check_budgets(results, budgets):
+    """Вернуть список нарушений бюджета вида «сценарий: метрика»."""
+    violations = []
+    for name, limits in budgets.items():
+        metrics = results.get(name)
+        if metrics is None:
+            continue
+        for metric, limit in limits.items():
+            if metrics[metric] > limit:
+                violations.append(
+                    f'{name}: {metric} = {metrics[metric]} > {limit}'
+                )
+    return violations
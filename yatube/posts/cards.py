@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.html import format_html
+
+CARD_TEMPLATE = 'includes/post.html'
+CARD_TIMEOUT = 86400
+
+
+def card_key(post):
+    """Ключ фрагмента карточки; card_version меняется с содержимым."""
+    return f'post_card:{post.pk}:{post.card_version}'
+
+
+def render_cards(posts, group=None):
+    """
+    Отрисовать карточки постов страницы.
+
+    Фрагменты карточек берутся из кэша одним get_many, недостающие
+    рендерятся скомпилированным шаблоном и кладутся одним set_many.
+    Фрагмент общий для всех лент, поэтому ссылка на группу, которой нет
+    на странице самой группы, добавляется снаружи.
+    """
+    posts = list(posts)
+    fragments = cache.get_many([card_key(post) for post in posts])
+    missing = {}
+    template = None
+    for post in posts:
+        key = card_key(post)
+        if key not in fragments:
+            template = template or get_template(CARD_TEMPLATE)
+            missing[key] = fragments[key] = template.render({'post': post})
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+    cards = []
+    for post in posts:
+        link = ''
+        if post.group_id and post.group != group:
+            link = format_html(
+                '<a href="{}">все записи группы.</a>',
+                reverse('posts:group_posts', args=[post.group.slug]),
+            )
+        cards.append(format_html(
+            '<article>\n{}\n{}\n</article>', fragments[card_key(post)], link
+        ))
+    return cards
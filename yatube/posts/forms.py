@@ -1,5 +1,8 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 
+from .images import store_image
 from .models import Comment, Post
 
 
@@ -18,6 +21,39 @@ class PostForm(forms.ModelForm):
 # , "image" с этим полем из 6го спринта не проходят тесты
 
 
+class PostImageForm(forms.Form):
+    """Картинка поста: проверяется и перекодируется до сохранения."""
+
+    image = forms.ImageField(
+        label="Картинка",
+        required=False,
+        help_text="Картинка будет уменьшена и сохранена без метаданных",
+    )
+
+    def __init__(self, *args, oversized=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.oversized = oversized
+
+    def clean_image(self):
+        image = self.cleaned_data["image"]
+        limit = settings.UPLOAD_MAX_BYTES
+        if "image" in self.oversized or image and image.size > limit:
+            raise forms.ValidationError(
+                f"Картинка больше {filesizeformat(limit)}"
+            )
+        side = settings.POST_IMAGE_MAX_SIDE
+        if image and max(image.image.size) > side:
+            raise forms.ValidationError(
+                f"Картинка больше {side} точек по одной из сторон"
+            )
+        return image
+
+    def save(self):
+        """Сохранить картинку и вернуть её имя или None."""
+        image = self.cleaned_data.get("image")
+        return store_image(image) if image else None
+
+
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
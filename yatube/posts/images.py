@@ -0,0 +1,57 @@
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Форматы, которые умеют хранить прозрачность.
+ALPHA_FORMATS = ('WEBP', 'PNG')
+
+
+def encode_image(upload):
+    """
+    Перекодировать картинку в POST_IMAGE_FORMAT и вернуть байты.
+
+    Ориентация из EXIF применяется к пикселям, сами метаданные
+    (EXIF с координатами, ICC-профили, комментарии) не переносятся.
+    Картинка уменьшается до POST_IMAGE_STORED_SIDE по большей стороне;
+    у анимаций остаётся первый кадр.
+    """
+    upload.seek(0)
+    with Image.open(upload) as source:
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail(
+            (settings.POST_IMAGE_STORED_SIDE,) * 2, Image.LANCZOS
+        )
+        alpha = image.mode in ('RGBA', 'LA', 'PA') or (
+            image.mode == 'P' and 'transparency' in image.info
+        )
+        if alpha and settings.POST_IMAGE_FORMAT in ALPHA_FORMATS:
+            image = image.convert('RGBA')
+        else:
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(
+            buffer,
+            format=settings.POST_IMAGE_FORMAT,
+            quality=settings.POST_IMAGE_QUALITY,
+        )
+    return buffer.getvalue()
+
+
+def store_image(upload):
+    """
+    Сохранить картинку поста под хэшем содержимого и вернуть её имя.
+
+    Одинаковые картинки получают одно имя, поэтому файл и его миниатюры
+    хранятся и строятся один раз, сколько бы постов их ни использовали.
+    """
+    data = encode_image(upload)
+    digest = hashlib.sha256(data).hexdigest()
+    extension = settings.POST_IMAGE_FORMAT.lower()
+    name = f'posts/{digest[:2]}/{digest}.{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
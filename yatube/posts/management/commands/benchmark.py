@@ -0,0 +1,125 @@
+import json
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from posts import benchmark
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число SQL-запросов и размер ответа основных '
+        'страниц, а также время отрисовки карточки поста на отдельной '
+        'тестовой базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--images', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--fanout', type=int, default=None,
+            help='Потоки core.fanout для запросов страниц; по умолчанию '
+                 'READ_FANOUT_WORKERS, 0 - по очереди.',
+        )
+        parser.add_argument(
+            '--output', help='Файл, куда записать результаты в JSON.'
+        )
+        parser.add_argument(
+            '--budget',
+            help='JSON с предельными значениями метрик по сценариям.',
+        )
+        parser.add_argument(
+            '--baseline', help='JSON прошлого прогона для сравнения.'
+        )
+
+    def handle(self, *args, **options):
+        fanout = options['fanout']
+        if fanout is None:
+            fanout = settings.READ_FANOUT_WORKERS
+        media_root = tempfile.mkdtemp()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with override_settings(MEDIA_ROOT=media_root,
+                                   BACKGROUND_WORKERS=0,
+                                   READ_FANOUT_WORKERS=fanout):
+                dataset = benchmark.seed(
+                    users=options['users'],
+                    groups=options['groups'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    images=options['images'],
+                )
+                results = benchmark.run(
+                    dataset, repeat=options['repeat'], cold=options['cold']
+                )
+                cards = benchmark.card_render(repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(media_root, ignore_errors=True)
+
+        report = {
+            'commit': current_commit(),
+            'dataset': {
+                key: options[key]
+                for key in ('users', 'groups', 'posts', 'comments', 'images')
+            },
+            'repeat': options['repeat'],
+            'cold': options['cold'],
+            'fanout': fanout,
+            'results': results,
+            'card_render': cards,
+        }
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file).get('results', {})
+        for name, metrics in results.items():
+            line = '{:<12} p50 {p50_ms:>9.2f} ms  p95 {p95_ms:>9.2f} ms  ' \
+                   '{queries:>3} SQL  {bytes:>8} B'.format(name, **metrics)
+            if name in baseline:
+                line += '  (p95 {:+.2f} ms, SQL {:+d})'.format(
+                    metrics['p95_ms'] - baseline[name]['p95_ms'],
+                    metrics['queries'] - baseline[name]['queries'],
+                )
+            self.stdout.write(line)
+        for mode, metrics in cards.items():
+            self.stdout.write(
+                'post_card    {} p50 {p50_ms:.4f} ms  p95 {p95_ms:.4f} ms '
+                'на пост'.format(mode, **metrics)
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+        if options['budget']:
+            with open(options['budget'], encoding='utf-8') as file:
+                violations = benchmark.check_budgets(results, json.load(file))
+            if violations:
+                raise CommandError(
+                    'Превышен бюджет:\n' + '\n'.join(violations)
+                )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры картинок постов.'
+
+    def handle(self, *args, **options):
+        pending = Post.objects.filter(thumbnail_url='').exclude(
+            image=''
+        ).values_list('pk', 'image')
+        built = 0
+        for post_id, image_name in pending.iterator():
+            generate_thumbnail(post_id, image_name)
+            built += 1
+        self.stdout.write(self.style.SUCCESS(f'Построено миниатюр: {built}'))
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Group, Post
+from yatube.settings import POST_PER_PAGE
+
+User = get_user_model()
+
+
+def feed_querysets():
+    """Вернуть основные запросы ленты в том виде, как их строят views."""
+    group = Group.objects.first()
+    author = User.objects.first()
+    post = Post.objects.first()
+    ordering = ('-pub_date', '-pk')
+    limit = POST_PER_PAGE + 1
+    return {
+        'index': Post.objects.feed().order_by(*ordering)[:limit],
+        'group_posts': Post.objects.feed().filter(
+            group__slug=group.slug if group else ''
+        ).order_by(*ordering)[:limit],
+        'profile': Post.objects.feed().filter(
+            author__username=author.username if author else ''
+        ).order_by(*ordering)[:limit],
+        'post_detail comments': Comment.objects.filter(
+            post_id=post.pk if post else 0
+        ).order_by('-created', '-pk'),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Печатает план выполнения основных запросов ленты.'
+
+    def handle(self, *args, **options):
+        for name, queryset in feed_querysets().items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(queryset.explain())
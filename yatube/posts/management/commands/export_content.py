@@ -0,0 +1,41 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.transfer import BATCH_SIZE, export_content
+
+
+class Command(BaseCommand):
+    help = 'Выгружает группы, посты и комментарии в NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', help='Файл выгрузки; "-" - стандартный вывод.'
+        )
+        parser.add_argument(
+            '--media-dir', help='Каталог, куда скопировать картинки постов.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(rows):
+            elapsed = time.perf_counter() - started
+            self.stderr.write(
+                f'Выгружено строк: {rows} '
+                f'({rows / max(elapsed, 1e-6):.0f} строк/с)'
+            )
+
+        if options['output'] == '-':
+            export_content(sys.stdout, options['media_dir'],
+                           options['batch_size'], progress)
+            return
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            written = export_content(stream, options['media_dir'],
+                                     options['batch_size'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено строк: {written} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,44 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import BATCH_SIZE, TransferError, import_content
+
+
+class Command(BaseCommand):
+    help = 'Загружает группы, посты и комментарии из NDJSON пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', help='Файл выгрузки; "-" - стандартный ввод.'
+        )
+        parser.add_argument(
+            '--media-dir', help='Каталог с картинками из выгрузки.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(rows):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'Прочитано строк: {rows} '
+                f'({rows / max(elapsed, 1e-6):.0f} строк/с)'
+            )
+
+        try:
+            if options['input'] == '-':
+                created = import_content(sys.stdin, options['media_dir'],
+                                         options['batch_size'], progress)
+            else:
+                with open(options['input'], encoding='utf-8') as lines:
+                    created = import_content(lines, options['media_dir'],
+                                             options['batch_size'], progress)
+        except (OSError, TransferError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            'Создано групп: {}, постов: {}, комментариев: {} за {:.1f} с'
+            .format(*created.values(), time.perf_counter() - started)
+        ))
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import (Count, IntegerField, OuterRef, Subquery,
+                              Value)
+from django.db.models.functions import Coalesce, Substr
+
+from posts.models import (GROUP_SNIPPET_LENGTH, AuthorStats, Comment,
+                          Follow, Group, Post)
+
+User = get_user_model()
+
+# Скрытые модератором посты и комментарии в счётчики не входят.
+VISIBLE_COMMENTS = Comment.objects.filter(hidden=False)
+
+
+def count_of(queryset, field):
+    """Подзапрос с числом строк queryset для внешней строки по field."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+@transaction.atomic
+def rebuild_counters():
+    """Пересчитать счётчики и последние посты групп по исходным таблицам."""
+    AuthorStats.objects.bulk_create(
+        [
+            AuthorStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        batch_size=1000,
+    )
+    AuthorStats.objects.update(
+        posts_count=count_of(Post.objects.visible(), 'author'),
+        comments_count=count_of(VISIBLE_COMMENTS, 'author'),
+        followers_count=count_of(Follow.objects.all(), 'author'),
+    )
+    latest = Post.objects.visible().filter(group=OuterRef('pk')).order_by(
+        '-pub_date', '-pk'
+    ).annotate(snippet=Substr('text', 1, GROUP_SNIPPET_LENGTH))
+    Group.objects.update(
+        posts_count=count_of(Post.objects.visible(), 'group'),
+        last_post_at=Subquery(latest.values('pub_date')[:1]),
+        last_post_snippet=Coalesce(
+            Subquery(latest.values('snippet')[:1]), Value('')
+        ),
+    )
+    Post.objects.update(
+        comments_count=count_of(VISIBLE_COMMENTS, 'post')
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики и последние посты групп.'
+
+    def handle(self, *args, **options):
+        rebuild_counters()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.search import BATCH_SIZE, get_backend, index_posts
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс постов пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            get_backend().clear()
+            indexed = index_posts(
+                Post.objects.visible(), batch_size=options['batch_size']
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {indexed} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "text, group_title, author_name, tokenize='unicode61')"
+)
+FILL_SQL = (
+    "INSERT INTO posts_post_fts (rowid, text, group_title, author_name) "
+    "SELECT p.id, p.text, COALESCE(g.title, ''), "
+    "TRIM(u.username || ' ' || u.first_name || ' ' || u.last_name) "
+    "FROM posts_post p "
+    "JOIN auth_user u ON u.id = p.author_id "
+    "LEFT JOIN posts_group g ON g.id = p.group_id"
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute(FILL_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_thumbnail_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:15
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+
+def fill_latest_post(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    latest = Post.objects.filter(group=OuterRef('pk')).order_by(
+        '-pub_date', '-pk'
+    ).annotate(snippet=Substr('text', 1, 200))
+    Group.objects.update(
+        last_post_at=Subquery(latest.values('pub_date')[:1]),
+        last_post_snippet=Coalesce(
+            Subquery(latest.values('snippet')[:1]), Value('')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_follow_timeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_post_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Время последнего поста'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='last_post_snippet',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='Начало последнего поста'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['title', 'id'], name='group_title_idx'),
+        ),
+        migrations.RunPython(fill_latest_post, migrations.RunPython.noop),
+    ]
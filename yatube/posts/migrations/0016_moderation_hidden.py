@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_group_latest_post'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='hidden',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Скрыт'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='hidden',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Скрыт'),
+        ),
+    ]
@@ -3,21 +3,96 @@ from django.db import models
 
 User = get_user_model()
 
+GROUP_SNIPPET_LENGTH = 200
 
-class Group(models.Model):
+
+class DerivedFieldsMixin:
+    """
+    Не перезаписывать производные поля при обычном save().
+
+    Счётчики, версия карточки и адрес миниатюры меняются только отдельными
+    UPDATE из posts.signals и фоновых задач, поэтому устаревшее значение
+    в памяти объекта не должно затирать их при редактировании.
+    """
+    derived_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.derived_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class AuthorStats(DerivedFieldsMixin, models.Model):
+    user = models.OneToOneField(
+        User,
+        verbose_name='Автор',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0, editable=False
+    )
+
+    derived_fields = ('posts_count', 'comments_count', 'followers_count')
+
+    class Meta:
+        verbose_name = "Статистика автора"
+        verbose_name_plural = "Статистика авторов"
+
+    def __str__(self) -> str:
+        return str(self.user)
+
+
+class Group(DerivedFieldsMixin, models.Model):
     title = models.CharField('Название группы', max_length=200)
     slug = models.SlugField('Текст ссылки', unique=True)
     description = models.TextField('Описание группы')
+    posts_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False
+    )
+    last_post_at = models.DateTimeField(
+        'Время последнего поста', null=True, editable=False
+    )
+    last_post_snippet = models.CharField(
+        'Начало последнего поста', max_length=GROUP_SNIPPET_LENGTH,
+        blank=True, editable=False
+    )
+
+    derived_fields = ('posts_count', 'last_post_at', 'last_post_snippet')
 
     class Meta:
         verbose_name = "Администрирование группы"
         verbose_name_plural = "Администрирование групп"
+        indexes = (
+            models.Index(fields=("title", "id"), name="group_title_idx"),
+        )
 
     def __str__(self) -> str:
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    def visible(self):
+        """Посты, не скрытые модератором."""
+        return self.filter(hidden=False)
+
+    def feed(self):
+        """Видимые посты для ленты вместе с автором и группой."""
+        return self.visible().select_related('author', 'group')
+
+
+class Post(DerivedFieldsMixin, models.Model):
     text = models.TextField('Текст поста', help_text='Введите текст поста')
     pub_date = models.DateTimeField('Время публикации', auto_now_add=True)
     author = models.ForeignKey(
@@ -40,11 +115,41 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False
+    )
+    card_version = models.PositiveIntegerField(
+        'Версия карточки', default=0, editable=False
+    )
+    thumbnail_url = models.CharField(
+        'Адрес миниатюры', max_length=255, blank=True, editable=False
+    )
+    hidden = models.BooleanField('Скрыт', default=False, editable=False)
+
+    objects = PostQuerySet.as_manager()
+    # hidden меняют только задачи posts.moderation: вместе с ним
+    # пересчитываются счётчики, поиск и ленты.
+    derived_fields = (
+        'comments_count', 'card_version', 'thumbnail_url', 'hidden'
+    )
 
     class Meta:
         verbose_name = "Администрирование поста"
         verbose_name_plural = "Администрирование постов"
         ordering = ("-pub_date", )
+        indexes = (
+            models.Index(
+                fields=("-pub_date", "-id"), name="post_pub_date_idx"
+            ),
+            models.Index(
+                fields=("group", "-pub_date", "-id"),
+                name="post_group_pub_date_idx",
+            ),
+            models.Index(
+                fields=("author", "-pub_date", "-id"),
+                name="post_author_pub_date_idx",
+            ),
+        )
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -68,11 +173,89 @@ class Comment(models.Model):
         help_text='Введите текст комментария'
     )
     created = models.DateTimeField('Время комментирования', auto_now_add=True)
+    hidden = models.BooleanField('Скрыт', default=False, editable=False)
 
     class Meta:
         verbose_name = "Администрирование комментария"
         verbose_name_plural = "Администрирование комментариев"
         ordering = ("-created", )
+        indexes = (
+            models.Index(
+                fields=("post", "-created", "-id"),
+                name="comment_post_created_idx",
+            ),
+        )
 
     def __str__(self) -> str:
         return self.text[:15]
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='follower'
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='following'
+    )
+
+    class Meta:
+        verbose_name = "Администрирование подписки"
+        verbose_name_plural = "Администрирование подписок"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "author"), name="unique_follow"
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.user} -> {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в заранее собранной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        verbose_name='Читатель',
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField('Время публикации')
+
+    class Meta:
+        verbose_name = "Запись ленты подписок"
+        verbose_name_plural = "Записи ленты подписок"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "post"), name="unique_timeline_post"
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("user", "-pub_date", "-post"),
+                name="timeline_user_pub_date_idx",
+            ),
+            models.Index(
+                fields=("user", "author"), name="timeline_user_author_idx"
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.user}: {self.post_id}'
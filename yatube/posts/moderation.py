@@ -0,0 +1,137 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from core.jobs import enqueue
+
+from .models import AuthorStats, Comment, Group, Post, TimelineEntry
+from .page_cache import invalidate_feeds
+from .search import get_backend, index_posts
+from .signals import refresh_latest_posts, shift_counter
+from .timeline import fan_out_post
+
+
+@transaction.atomic
+def enqueue_chunks(func, queryset, *args):
+    """
+    Поставить func(ids, *args) в очередь пачками по MODERATION_CHUNK_SIZE.
+
+    Из queryset читаются только первичные ключи и потоком, поэтому
+    выделить в админке можно хоть все строки таблицы: запрос админки
+    лишь пишет задачи, а строки меняют исполнители после коммита.
+    Вернуть число строк.
+    """
+    size = settings.MODERATION_CHUNK_SIZE
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    chunk = []
+    total = 0
+    for pk in ids.iterator(chunk_size=size):
+        chunk.append(pk)
+        if len(chunk) == size:
+            enqueue(func, chunk, *args)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        enqueue(func, chunk, *args)
+        total += len(chunk)
+    return total
+
+
+def _shift_counts(model, field, owners, delta):
+    """Сдвинуть счётчик field каждой строки на delta на строку owners."""
+    for pk, count in Counter(owners).items():
+        shift_counter(model, pk, field, delta * count)
+
+
+def delete_posts(ids):
+    """Удалить посты; счётчики, поиск и ленты обновят сигналы удаления."""
+    with transaction.atomic():
+        Post.objects.filter(pk__in=ids).delete()
+
+
+def delete_comments(ids):
+    with transaction.atomic():
+        Comment.objects.filter(pk__in=ids).delete()
+
+
+@transaction.atomic
+def move_posts(ids, group_id):
+    """Перенести посты в группу group_id (None - убрать из группы)."""
+    posts = Post.objects.select_for_update().filter(pk__in=ids).exclude(
+        group_id=group_id
+    )
+    rows = list(posts.values_list('pk', 'author_id', 'group_id', 'hidden'))
+    if not rows:
+        return
+    pks = [pk for pk, *_ in rows]
+    Post.objects.filter(pk__in=pks).update(
+        group_id=group_id, card_version=F('card_version') + 1
+    )
+    visible = [group for _, _, group, hidden in rows if not hidden]
+    _shift_counts(Group, 'posts_count', visible, -1)
+    shift_counter(Group, group_id, 'posts_count', len(visible))
+    groups = {group for _, _, group, _ in rows} | {group_id}
+    refresh_latest_posts(groups)
+    invalidate_feeds({author for _, author, _, _ in rows}, groups)
+    # Название группы входит в поисковый документ поста.
+    index_posts(Post.objects.visible().filter(pk__in=pks))
+
+
+@transaction.atomic
+def hide_posts(ids, hidden=True):
+    """
+    Скрыть посты (hidden=False - вернуть) из лент, поиска и счётчиков.
+
+    Строки остаются в базе, поэтому решение модератора можно отменить
+    тем же действием без потери комментариев.
+    """
+    posts = Post.objects.select_for_update().filter(pk__in=ids).exclude(
+        hidden=hidden
+    )
+    rows = list(posts.values_list('pk', 'author_id', 'group_id'))
+    if not rows:
+        return
+    pks = [pk for pk, _, _ in rows]
+    Post.objects.filter(pk__in=pks).update(
+        hidden=hidden, card_version=F('card_version') + 1
+    )
+    delta = -1 if hidden else 1
+    authors = [author for _, author, _ in rows]
+    groups = [group for _, _, group in rows]
+    _shift_counts(AuthorStats, 'posts_count', authors, delta)
+    _shift_counts(Group, 'posts_count', groups, delta)
+    refresh_latest_posts(groups)
+    invalidate_feeds(set(authors), set(groups))
+    if hidden:
+        TimelineEntry.objects.filter(post_id__in=pks).delete()
+        get_backend().remove(pks)
+        return
+    index_posts(Post.objects.filter(pk__in=pks))
+    for pk in pks:
+        enqueue(fan_out_post, pk)
+
+
+@transaction.atomic
+def hide_comments(ids, hidden=True):
+    """Скрыть комментарии (hidden=False - вернуть) и поправить счётчики."""
+    comments = Comment.objects.select_for_update().filter(
+        pk__in=ids
+    ).exclude(hidden=hidden)
+    rows = list(comments.values_list('pk', 'post_id', 'author_id'))
+    if not rows:
+        return
+    Comment.objects.filter(pk__in=[pk for pk, _, _ in rows]).update(
+        hidden=hidden
+    )
+    delta = -1 if hidden else 1
+    _shift_counts(Post, 'comments_count', [post for _, post, _ in rows],
+                  delta)
+    _shift_counts(AuthorStats, 'comments_count',
+                  [author for _, _, author in rows], delta)
+    # Число комментариев могло вернуться к прежнему, а их состав - нет:
+    # новая версия карточки меняет ETag страницы поста.
+    Post.objects.filter(pk__in={post for _, post, _ in rows}).update(
+        card_version=F('card_version') + 1
+    )
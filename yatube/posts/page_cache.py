@@ -0,0 +1,256 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import partial, wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core.db import current_replica
+
+from .models import Group, Post
+from .utils import CURSOR_PARAM
+
+User = get_user_model()
+
+HITS_KEY = 'page_cache:hits'
+MISSES_KEY = 'page_cache:misses'
+
+
+def index_scope():
+    return 'index'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def groups_scope():
+    return 'groups'
+
+
+def _generation_key(scope):
+    return f'page_cache:generation:{scope}'
+
+
+def _modified_key(scope):
+    return f'page_cache:modified:{scope}'
+
+
+def generation(scope):
+    """
+    Текущее поколение области кэша (лента, группа или профиль).
+
+    Начальное значение берётся из часов, чтобы после вытеснения ключа
+    новое поколение не совпало с одним из прежних. Ключ живёт
+    PAGE_GENERATION_TIMEOUT: даже сброс, не дошедший до кэша этого
+    процесса, перестаёт давать 304 и попадания не позже этого срока.
+    """
+    key = _generation_key(scope)
+    value = cache.get(key)
+    if value is None:
+        timeout = settings.PAGE_GENERATION_TIMEOUT
+        if cache.add(key, time.time_ns(), timeout):
+            cache.set(_modified_key(scope), time.time(), timeout)
+        value = cache.get(key)
+    return value
+
+
+def last_modified(scope):
+    """Время последнего сброса области или None, если оно неизвестно."""
+    value = cache.get(_modified_key(scope))
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+def replica_may_lag(scope):
+    """
+    Страница читается с реплики, а область менялась только что.
+
+    Такую страницу нельзя класть в кэш и отдавать с валидатором:
+    реплика могла ещё не получить изменение, и устаревшая страница
+    закрепилась бы под новым поколением.
+    """
+    if current_replica() is None:
+        return False
+    changed = cache.get(_modified_key(scope))
+    return (changed is not None
+            and time.time() - changed < settings.REPLICA_STICKY_SECONDS)
+
+
+def invalidate(*scopes):
+    """Сбросить страницы областей, сдвинув их поколение."""
+    timeout = settings.PAGE_GENERATION_TIMEOUT
+    for scope in scopes:
+        try:
+            cache.incr(_generation_key(scope))
+        except ValueError:
+            cache.set(_generation_key(scope), time.time_ns(), timeout)
+        cache.set(_modified_key(scope), time.time(), timeout)
+
+
+def invalidate_feeds(author_ids=(), group_ids=()):
+    """
+    Сбросить кэш ленты, профилей авторов и страниц групп.
+
+    Сброс повторяется после коммита: иначе параллельный запрос успел бы
+    положить в кэш страницу, прочитанную до коммита.
+    """
+    scopes = [index_scope()]
+    scopes += [
+        profile_scope(username) for username in User.objects.filter(
+            pk__in=author_ids
+        ).values_list('username', flat=True)
+    ]
+    scopes += [
+        group_scope(slug) for slug in Group.objects.filter(
+            pk__in=[pk for pk in group_ids if pk is not None]
+        ).values_list('slug', flat=True)
+    ]
+    invalidate(*scopes)
+    transaction.on_commit(lambda: invalidate(*scopes))
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def stats():
+    """Счётчики попаданий и промахов страничного кэша."""
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def cache_anonymous_page(scope):
+    """
+    Кэшировать страницу для анонимных GET-запросов.
+
+    scope получает именованные аргументы view и возвращает имя области,
+    поколение которой входит в ключ вместе с путём и курсором страницы.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            page = '%s?%s' % (request.path, request.GET.get(CURSOR_PARAM, ''))
+            key = 'page_cache:page:%s:%s' % (
+                generation(scope(**kwargs)),
+                hashlib.md5(page.encode()).hexdigest(),
+            )
+            content = cache.get(key)
+            if content is not None:
+                _count(HITS_KEY)
+                response = HttpResponse(content)
+                response['X-Page-Cache'] = 'HIT'
+                return response
+            _count(MISSES_KEY)
+            response = view(request, *args, **kwargs)
+            if (response.status_code == 200
+                    and not replica_may_lag(scope(**kwargs))):
+                cache.set(key, response.content, settings.PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def post_version(post_id):
+    """
+    Версия страницы поста одним узким запросом по первичному ключу.
+
+    В неё входит всё, что меняет страницу: правки поста и миниатюры
+    (card_version), комментарии, число постов автора и группа.
+    """
+    row = Post.objects.visible().filter(pk=post_id).values_list(
+        'card_version', 'comments_count', 'author__stats__posts_count',
+        'group__title', 'group__slug',
+    ).order_by().first()
+    return None if row is None else ':'.join(map(str, row))
+
+
+def _etag(version, request, *args, **kwargs):
+    value = version(**kwargs)
+    if value is None:
+        return None
+    raw = '%s:%s:%s' % (
+        value, request.GET.get(CURSOR_PARAM, ''), request.user.pk
+    )
+    if request.user.is_authenticated:
+        # Форма комментария несёт CSRF-токен, а он меняется при входе:
+        # 304 вернул бы сохранённую страницу со старым токеном.
+        raw += ':' + request.META.get('CSRF_COOKIE', '')
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _last_modified_at(modified, request, *args, **kwargs):
+    if modified is None or request.user.is_authenticated:
+        return None
+    return modified(**kwargs)
+
+
+def _no_cache(request, response):
+    if response.status_code not in (200, 304):
+        # Валидатор не должен закрепить у клиента 404 или ошибку.
+        for header in ('ETag', 'Last-Modified'):
+            if response.has_header(header):
+                del response[header]
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def conditional_page(version, modified=None):
+    """
+    Отвечать 304 по ETag и Last-Modified, не выполняя view.
+
+    version получает именованные аргументы view и дёшево возвращает
+    версию содержимого (None - страницы нет), modified - время его
+    последнего изменения. ETag учитывает курсор, пользователя и его
+    CSRF-токен, а Last-Modified отдаётся только анонимам: страница
+    вошедшего пользователя отличается от анонимной при той же дате.
+    Ответ помечается no-cache, чтобы браузер и CDN всегда
+    переспрашивали.
+    """
+    def decorator(view):
+        conditional = condition(
+            partial(_etag, version), partial(_last_modified_at, modified)
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return _no_cache(request, conditional(request, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def conditional_feed(scope):
+    """conditional_page для ленты: версия - поколение области кэша."""
+    def version(**kwargs):
+        if replica_may_lag(scope(**kwargs)):
+            return None
+        return generation(scope(**kwargs))
+
+    def modified(**kwargs):
+        if replica_may_lag(scope(**kwargs)):
+            return None
+        return last_modified(scope(**kwargs))
+
+    return conditional_page(version, modified)
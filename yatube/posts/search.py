@@ -0,0 +1,175 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Post
+from .utils import NEXT, CursorPage, decode_cursor, encode_cursor
+
+BATCH_SIZE = 1000
+
+
+def document(post):
+    """Поля поста, по которым ищет поиск: текст, группа и автор."""
+    author = post.author
+    return (
+        post.pk,
+        post.text,
+        post.group.title if post.group_id else '',
+        ' '.join(filter(None, [author.username, author.get_full_name()])),
+    )
+
+
+class SearchBackend:
+    """Интерфейс поискового индекса постов."""
+
+    def index(self, documents):
+        raise NotImplementedError
+
+    def remove(self, post_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query, after=None, limit=10):
+        """
+        Вернуть до limit пар (id поста, ранг) по возрастанию ранга.
+
+        after - пара (ранг, id) последнего результата прошлой страницы.
+        """
+        raise NotImplementedError
+
+
+class SqliteFTSBackend(SearchBackend):
+    """Индекс на виртуальной таблице SQLite FTS5 с ранжированием bm25."""
+
+    table = 'posts_post_fts'
+
+    def index(self, documents):
+        documents = list(documents)
+        if not documents:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(doc[0],) for doc in documents],
+            )
+            cursor.executemany(
+                f'INSERT INTO {self.table} '
+                '(rowid, text, group_title, author_name) '
+                'VALUES (%s, %s, %s, %s)',
+                documents,
+            )
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [(pk,) for pk in post_ids],
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    @staticmethod
+    def match_expression(query):
+        """Превратить ввод пользователя в префиксный запрос FTS5."""
+        words = re.findall(r'\w+', query)
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def search(self, query, after=None, limit=10):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        sql = (
+            f'SELECT rowid, rank FROM {self.table} '
+            f'WHERE {self.table} MATCH %s'
+        )
+        params = [expression]
+        if after is not None:
+            sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY rank, rowid LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    Запасной вариант для баз без FTS5: поиск по тексту через icontains.
+
+    Индекс ему не нужен, поэтому index, remove и clear ничего не делают.
+    """
+
+    def index(self, documents):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, after=None, limit=10):
+        posts = Post.objects.visible().filter(
+            text__icontains=query
+        ).order_by('pk')
+        if after is not None:
+            posts = posts.filter(pk__gt=after[1])
+        return [(pk, 0) for pk in posts.values_list('pk', flat=True)[:limit]]
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def index_posts(queryset, batch_size=BATCH_SIZE):
+    """Проиндексировать посты пачками по batch_size, идя по pk."""
+    queryset = queryset.select_related('author', 'group').order_by('pk')
+    last_pk = 0
+    indexed = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return indexed
+        get_backend().index(document(post) for post in batch)
+        indexed += len(batch)
+        last_pk = batch[-1].pk
+
+
+def reindex_group(group_id):
+    """Фоновая задача: переиндексировать посты группы после переименования."""
+    index_posts(Post.objects.visible().filter(group_id=group_id))
+
+
+def reindex_author(author_id):
+    """Фоновая задача: переиндексировать посты автора после смены имени."""
+    index_posts(Post.objects.visible().filter(author_id=author_id))
+
+
+def search_page(query, cursor=None, per_page=10):
+    """Страница результатов поиска по рангу с курсором на следующую."""
+    after = None
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded is not None:
+        try:
+            rank, pk = decoded[1]
+            after = (float(rank), int(pk))
+        except (TypeError, ValueError):
+            after = None
+    hits = get_backend().search(query, after=after, limit=per_page + 1)
+    has_next = len(hits) > per_page
+    hits = hits[:per_page]
+    posts = Post.objects.feed().in_bulk([pk for pk, rank in hits])
+    rows = [posts[pk] for pk, rank in hits if pk in posts]
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_cursor(NEXT, list(hits[-1][::-1]))
+    return CursorPage(rows, None, next_cursor, None)
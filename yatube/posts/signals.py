@@ -0,0 +1,252 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.jobs import enqueue
+
+from .models import (GROUP_SNIPPET_LENGTH, AuthorStats, Comment, Follow,
+                     Group, Post, TimelineEntry)
+from .page_cache import (group_scope, groups_scope, invalidate,
+                         invalidate_feeds, profile_scope)
+from .search import document, get_backend, reindex_author, reindex_group
+from .thumbnails import schedule_thumbnail
+from .timeline import schedule_backfill, schedule_fan_out, unfollow_timeline
+
+User = get_user_model()
+
+
+def shift_counter(model, pk, field, delta):
+    """Атомарно изменить счётчик строки на delta."""
+    if pk is not None:
+        model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def refresh_latest_posts(group_ids):
+    """Обновить время и начало последнего поста групп и их каталог."""
+    group_ids = {pk for pk in group_ids if pk is not None}
+    for group_id in group_ids:
+        latest = Post.objects.visible().filter(group_id=group_id).order_by(
+            '-pub_date', '-pk'
+        ).values('pub_date', 'text').first()
+        Group.objects.filter(pk=group_id).update(
+            last_post_at=latest['pub_date'] if latest else None,
+            last_post_snippet=(
+                latest['text'][:GROUP_SNIPPET_LENGTH] if latest else ''
+            ),
+        )
+    if group_ids:
+        invalidate(groups_scope())
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+AUTHOR_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_author_names(sender, instance, raw=False, **kwargs):
+    """Запомнить имя из БД: оно входит в карточки и поиск постов."""
+    if raw or instance._state.adding:
+        return
+    instance._previous_names = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*AUTHOR_NAME_FIELDS).first()
+
+
+def author_renamed(instance):
+    """Сохранение поменяло имя автора (вход в систему и пароль - нет)."""
+    previous = getattr(instance, '_previous_names', None)
+    current = tuple(getattr(instance, name) for name in AUTHOR_NAME_FIELDS)
+    return previous is not None and previous != current
+
+
+@receiver(post_save, sender=User)
+def refresh_author_cards(sender, instance, created, raw=False, **kwargs):
+    """Карточки постов показывают имя автора и ссылку на профиль."""
+    if created or raw or not author_renamed(instance):
+        return
+    posts = Post.objects.filter(author=instance)
+    posts.update(card_version=F('card_version') + 1)
+    invalidate_feeds(
+        [instance.pk],
+        posts.order_by().values_list('group_id', flat=True).distinct(),
+    )
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_delete, sender=Post)
+def remember_post_state(sender, instance, raw=False, **kwargs):
+    """Запомнить автора, группу, картинку и видимость из БД."""
+    if raw or instance._state.adding:
+        return
+    instance._previous_state = Post.objects.filter(
+        pk=instance.pk
+    ).values('author_id', 'group_id', 'image', 'hidden').first()
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        shift_counter(AuthorStats, instance.author_id, 'posts_count', 1)
+        shift_counter(Group, instance.group_id, 'posts_count', 1)
+        refresh_latest_posts([instance.group_id])
+        invalidate_feeds([instance.author_id], [instance.group_id])
+        if instance.image:
+            schedule_thumbnail(instance)
+        schedule_fan_out(instance)
+        return
+    # Текст, группа или картинка поменялись: старый фрагмент карточки
+    # в кэше больше не читается, так как его ключ содержит версию.
+    shift_counter(Post, instance.pk, 'card_version', 1)
+    previous = getattr(instance, '_previous_state', None) or {
+        'author_id': instance.author_id,
+        'group_id': instance.group_id,
+        'image': instance.image.name,
+        'hidden': instance.hidden,
+    }
+    if previous['image'] != instance.image.name:
+        # До готовности новой миниатюры карточка показывает заглушку.
+        Post.objects.filter(pk=instance.pk).update(thumbnail_url='')
+        if instance.image:
+            schedule_thumbnail(instance)
+    refresh_latest_posts([previous['group_id'], instance.group_id])
+    invalidate_feeds(
+        {previous['author_id'], instance.author_id},
+        {previous['group_id'], instance.group_id},
+    )
+    if previous['hidden']:
+        # Скрытый пост не входит в счётчики и ленты.
+        return
+    if previous['author_id'] != instance.author_id:
+        shift_counter(AuthorStats, previous['author_id'], 'posts_count', -1)
+        shift_counter(AuthorStats, instance.author_id, 'posts_count', 1)
+        # У нового автора другие подписчики: ленты собираются заново.
+        TimelineEntry.objects.filter(post=instance).delete()
+        schedule_fan_out(instance)
+    if previous['group_id'] != instance.group_id:
+        shift_counter(Group, previous['group_id'], 'posts_count', -1)
+        shift_counter(Group, instance.group_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    owners = getattr(instance, '_previous_state', None) or {
+        'author_id': instance.author_id, 'group_id': instance.group_id,
+        'hidden': instance.hidden,
+    }
+    if owners['hidden']:
+        return
+    shift_counter(AuthorStats, owners['author_id'], 'posts_count', -1)
+    shift_counter(Group, owners['group_id'], 'posts_count', -1)
+    refresh_latest_posts([owners['group_id']])
+    invalidate_feeds([owners['author_id']], [owners['group_id']])
+
+
+def group_authors(group_id):
+    """Авторы постов группы: их профили показывают ссылку на группу."""
+    return set(Post.objects.filter(group_id=group_id).order_by().values_list(
+        'author_id', flat=True
+    ).distinct())
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_names(sender, instance, raw=False, **kwargs):
+    """Запомнить slug и название: на них ссылаются ленты и поиск."""
+    if raw or instance._state.adding:
+        return
+    instance._previous_names = Group.objects.filter(
+        pk=instance.pk
+    ).values('slug', 'title').first()
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_page(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate(groups_scope())
+    if created:
+        return
+    invalidate(group_scope(instance.slug))
+    previous = getattr(instance, '_previous_names', None)
+    if previous is not None and previous['slug'] != instance.slug:
+        # Карточки ленты и профилей ссылаются на группу по slug.
+        invalidate(group_scope(previous['slug']))
+        invalidate_feeds(group_authors(instance.pk))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    # После удаления у постов уже не будет группы, по которой их искать.
+    instance._authors = group_authors(instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_group_directory(sender, instance, **kwargs):
+    invalidate(groups_scope(), group_scope(instance.slug))
+    invalidate_feeds(getattr(instance, '_authors', ()))
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        shift_counter(Post, instance.post_id, 'comments_count', 1)
+        shift_counter(AuthorStats, instance.author_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.hidden:
+        return
+    shift_counter(Post, instance.post_id, 'comments_count', -1)
+    shift_counter(AuthorStats, instance.author_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        shift_counter(AuthorStats, instance.author_id, 'followers_count', 1)
+        invalidate(profile_scope(instance.author.username))
+        schedule_backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    shift_counter(AuthorStats, instance.author_id, 'followers_count', -1)
+    invalidate(profile_scope(instance.author.username))
+    unfollow_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, **kwargs):
+    if not raw and not instance.hidden:
+        get_backend().index([document(instance)])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    get_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Group)
+def reindex_group_posts(sender, instance, created, raw=False, **kwargs):
+    """Название группы входит в индекс её постов."""
+    previous = getattr(instance, '_previous_names', None)
+    if created or raw or previous is None:
+        return
+    if previous['title'] != instance.title:
+        enqueue(reindex_group, instance.pk)
+
+
+@receiver(post_save, sender=User)
+def reindex_author_posts(sender, instance, created, raw=False, **kwargs):
+    """Имя автора входит в индекс его постов; вход в систему не в счёт."""
+    if not created and not raw and author_renamed(instance):
+        enqueue(reindex_author, instance.pk)
@@ -0,0 +1,11 @@
+from django import template
+
+from ..cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Карточки постов ленты: {% post_cards page_obj as cards %}."""
+    return render_cards(posts, context.get('group'))
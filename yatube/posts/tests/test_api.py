@@ -0,0 +1,129 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+POSTS = 13
+POST_PER_PAGE = 10
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for number in range(POSTS):
+            Post.objects.create(
+                author=cls.user, text=f'Тестовый пост {number}',
+                group=cls.group if number % 2 else None,
+            )
+        cls.post = Post.objects.latest('pub_date', 'pk')
+        for number in range(3):
+            Comment.objects.create(
+                author=cls.user, post=cls.post, text=f'Комментарий {number}'
+            )
+
+    def test_endpoints_mirror_html_views(self):
+        """Эндпоинты отдают те же посты, что и HTML-страницы."""
+        cases = (
+            (reverse('api:index'), Post.objects.all()),
+            (reverse('api:group_posts', args=[self.group.slug]),
+             self.group.posts.all()),
+            (reverse('api:profile', args=[self.user.username]),
+             self.user.posts.all()),
+        )
+        for url, expected in cases:
+            with self.subTest(url=url):
+                ids = []
+                cursor = None
+                while True:
+                    params = {'cursor': cursor} if cursor else {}
+                    data = self.client.get(url, params).json()
+                    ids += [post['id'] for post in data['results']]
+                    cursor = data['next_cursor']
+                    if cursor is None:
+                        break
+                self.assertEqual(ids, list(
+                    expected.order_by('-pub_date', '-pk')
+                    .values_list('pk', flat=True)
+                ))
+
+    def test_post_representation(self):
+        """Пост отдаётся с автором, группой и адресом."""
+        data = self.client.get(reverse('api:index')).json()
+        post = data['results'][0]
+        self.assertEqual(post['id'], self.post.pk)
+        self.assertEqual(post['author'], 'NoName')
+        self.assertEqual(post['comments_count'], 3)
+        self.assertEqual(
+            post['url'], reverse('posts:post_detail', args=[self.post.pk])
+        )
+
+    def test_sparse_fieldsets(self):
+        """?fields= оставляет только запрошенные поля."""
+        response = self.client.get(reverse('api:index'), {'fields': 'id,text'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'text'})
+        response = self.client.get(reverse('api:index'), {'fields': 'secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_etag(self):
+        """Совпавший If-None-Match даёт 304, изменение поста - новый ETag."""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Изменённый пост'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_comments(self):
+        """Комментарии поста листаются курсором."""
+        url = reverse('api:post_comments', args=[self.post.pk])
+        data = self.client.get(url, {'fields': 'text'}).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']],
+            ['Комментарий 2', 'Комментарий 1', 'Комментарий 0'],
+        )
+        self.assertIsNone(data['next_cursor'])
+
+    def test_fixed_number_of_queries(self):
+        """Число запросов не зависит от размера страницы."""
+        cases = (
+            (reverse('api:index'), 1),
+            (reverse('api:group_posts', args=[self.group.slug]), 2),
+            (reverse('api:profile', args=[self.user.username]), 2),
+            (reverse('api:post_comments', args=[self.post.pk]), 2),
+        )
+        for url, queries in cases:
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                self.client.get(url)
+
+    def test_export_streams_ndjson(self):
+        """Выгрузка отдаёт все посты потоком по строке на пост."""
+        response = self.client.get(
+            reverse('api:export_posts'),
+            {'group': self.group.slug, 'fields': 'id'},
+        )
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), self.group.posts.count())
+        self.assertEqual(set(rows[0]), {'id'})
+
+    def test_read_only(self):
+        """API не принимает изменяющие запросы."""
+        response = self.client.post(reverse('api:index'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from .. import benchmark
+from ..models import Comment, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, BACKGROUND_WORKERS=0)
+class BenchmarkTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_seed_creates_dataset(self):
+        """seed создаёт заданное число постов, комментариев и картинок."""
+        dataset = benchmark.seed(
+            users=3, groups=2, posts=25, comments=40, images=2
+        )
+        self.assertEqual(Post.objects.count(), 25)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertEqual(
+            Post.objects.exclude(thumbnail_url='').count(), 2
+        )
+        self.assertEqual(dataset['author'].stats.posts_count, 9)
+
+    def test_run_records_metrics_for_every_scenario(self):
+        """run возвращает задержку, число запросов и размер ответа."""
+        dataset = benchmark.seed(
+            users=2, groups=1, posts=15, comments=5, images=0
+        )
+        results = benchmark.run(dataset, repeat=2, cold=True)
+        self.assertEqual(
+            set(results),
+            {'index', 'group_posts', 'profile', 'post_detail',
+             'post_create', 'add_comment'},
+        )
+        for name, metrics in results.items():
+            with self.subTest(name=name):
+                self.assertLessEqual(metrics['p50_ms'], metrics['p95_ms'])
+                self.assertGreater(metrics['queries'], 0)
+        self.assertGreater(results['index']['bytes'], 0)
+
+    def test_check_budgets_reports_violations(self):
+        """check_budgets называет сценарий и метрику сверх бюджета."""
+        results = {'index': {'p95_ms': 12.0, 'queries': 3}}
+        budgets = {'index': {'p95_ms': 10, 'queries': 3}, 'other': {}}
+        self.assertEqual(
+            benchmark.check_budgets(results, budgets),
+            ['index: p95_ms = 12.0 > 10'],
+        )
+
+    def test_percentile(self):
+        """percentile считает перцентиль методом ближайшего ранга."""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 95), 95)
@@ -1,11 +1,14 @@
+import os
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Group, Post
 
@@ -106,3 +109,74 @@ class PostFormTests(TestCase):
         self.assertEqual(
             Post.objects.get(id=post.id).text, 'Изменяемый текст поста'
         )
+
+
+def make_image(size=(40, 20), image_format='JPEG', **params):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format=image_format, **params)
+    return SimpleUploadedFile(
+        name=f'photo.{image_format.lower()}',
+        content=buffer.getvalue(),
+        content_type=f'image/{image_format.lower()}',
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create(self, image, text='Пост с картинкой'):
+        return self.client.post(
+            reverse('posts:post_create'), {'text': text, 'image': image}
+        )
+
+    def test_image_reencoded_without_metadata(self):
+        """Картинка перекодируется, уменьшается и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        with override_settings(POST_IMAGE_STORED_SIDE=10):
+            self.create(make_image(exif=exif.tobytes()))
+        post = Post.objects.get(author=self.user)
+        self.assertRegex(post.image.name, r'^posts/\w{2}/\w{64}\.webp$')
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'WEBP')
+            self.assertEqual(stored.size, (10, 5))
+            self.assertFalse(stored.getexif())
+
+    def test_same_image_stored_once(self):
+        """Одинаковые картинки разных постов лежат в одном файле."""
+        self.create(make_image(), 'Первый')
+        self.create(make_image(), 'Второй')
+        first, second = Post.objects.filter(author=self.user)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(first.image.path))), 1
+        )
+
+    def test_invalid_images_rejected(self):
+        """Слишком большие и битые файлы не сохраняются."""
+        broken = SimpleUploadedFile('photo.jpg', b'not an image')
+        cases = (
+            ({'UPLOAD_MAX_BYTES': 100}, make_image()),
+            ({'POST_IMAGE_MAX_SIDE': 30}, make_image()),
+            ({}, broken),
+        )
+        for limits, image in cases:
+            with self.subTest(limits=limits), override_settings(**limits):
+                response = self.create(image)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(
+                    response.context['image_form'].errors['image']
+                )
+        self.assertFalse(Post.objects.filter(author=self.user).exists())
@@ -1,7 +1,13 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
 
-from ..models import Group, Post
+from ..management.commands.explain_feeds import feed_querysets
+from ..management.commands.rebuild_counters import rebuild_counters
+from ..models import AuthorStats, Comment, Group, Post
 
 User = get_user_model()
 
@@ -48,3 +54,124 @@ class GroupModelTest(TestCase):
         group = GroupModelTest.group
         expected = group.title
         self.assertEqual(expected, str(group.title))
+
+
+class FeedIndexesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий'
+        )
+
+    def test_feed_queries_read_from_index(self):
+        """Основные запросы ленты читают данные по индексу."""
+        expected_indexes = {
+            'index': 'post_pub_date_idx',
+            'group_posts': 'post_group_pub_date_idx',
+            'profile': 'post_author_pub_date_idx',
+            'post_detail comments': 'comment_post_created_idx',
+        }
+        querysets = feed_querysets()
+        for name, index_name in expected_indexes.items():
+            with self.subTest(name=name):
+                self.assertIn(index_name, querysets[name].explain())
+
+    def test_explain_feeds_command_prints_plans(self):
+        """Команда explain_feeds печатает план каждого запроса."""
+        out = StringIO()
+        call_command('explain_feeds', stdout=out)
+        for name in feed_querysets():
+            with self.subTest(name=name):
+                self.assertIn(name, out.getvalue())
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertCounters(self, author_posts, author_comments, group_posts):
+        stats = AuthorStats.objects.get(user=self.user)
+        self.assertEqual(stats.posts_count, author_posts)
+        self.assertEqual(stats.comments_count, author_comments)
+        self.assertEqual(
+            Group.objects.get(pk=self.group.pk).posts_count, group_posts
+        )
+
+    def test_counters_follow_views(self):
+        """Счётчики меняются при создании поста и комментария."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст поста', 'group': self.group.pk},
+        )
+        post = Post.objects.get()
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            data={'text': 'Комментарий'},
+        )
+        self.assertCounters(1, 1, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
+    def test_counters_follow_group_change_and_delete(self):
+        """Смена группы и удаление поста переносят счётчики."""
+        post = Post.objects.create(
+            author=self.user, text='Текст поста', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            data={'text': 'Новый текст', 'group': self.other_group.pk},
+        )
+        self.assertCounters(1, 1, 0)
+        self.assertEqual(
+            Group.objects.get(pk=self.other_group.pk).posts_count, 1
+        )
+        post.delete()
+        self.assertCounters(0, 0, 0)
+        self.assertEqual(
+            Group.objects.get(pk=self.other_group.pk).posts_count, 0
+        )
+
+    def test_save_does_not_overwrite_counters(self):
+        """Сохранение устаревшего объекта не затирает счётчик."""
+        post = Post.objects.create(author=self.user, text='Текст поста')
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+
+    def test_rebuild_counters(self):
+        """rebuild_counters восстанавливает счётчики по данным."""
+        post = Post.objects.create(
+            author=self.user, text='Текст поста', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        AuthorStats.objects.all().delete()
+        Group.objects.update(posts_count=7)
+        Post.objects.update(comments_count=7)
+        rebuild_counters()
+        self.assertCounters(1, 1, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
@@ -0,0 +1,237 @@
+import json
+
+from django.contrib.admin import site
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import Job
+
+from .. import moderation
+from ..models import AuthorStats, Comment, Group, Post, TimelineEntry
+from ..search import get_backend
+from ..utils import CURSOR_PARAM
+
+User = get_user_model()
+
+
+class ModerationJobsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.spam = Group.objects.create(title='Спам', slug='spam')
+        self.trash = Group.objects.create(title='Корзина', slug='trash')
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}',
+                                group=self.spam)
+            for i in range(3)
+        ]
+        self.comment = Comment.objects.create(
+            author=self.reader, post=self.posts[0], text='Комментарий'
+        )
+
+    def posts_count(self, model, pk):
+        return model.objects.get(pk=pk).posts_count
+
+    def test_enqueue_chunks_splits_ids(self):
+        with override_settings(MODERATION_CHUNK_SIZE=2):
+            total = moderation.enqueue_chunks(
+                moderation.hide_posts, Post.objects.all(), True
+            )
+        self.assertEqual(total, 3)
+        jobs = Job.objects.filter(
+            func='posts.moderation.hide_posts'
+        ).order_by('pk')
+        self.assertEqual(
+            [json.loads(job.args) for job in jobs],
+            [[[self.posts[0].pk, self.posts[1].pk], True],
+             [[self.posts[2].pk], True]],
+        )
+
+    def test_hide_posts_and_back(self):
+        post = self.posts[2]
+        TimelineEntry.objects.create(
+            user=self.reader, post=post, author=self.author,
+            pub_date=post.pub_date,
+        )
+        moderation.hide_posts([post.pk], True)
+        post.refresh_from_db()
+        self.assertTrue(post.hidden)
+        self.assertNotIn(post, Post.objects.feed())
+        self.assertEqual(self.posts_count(Group, self.spam.pk), 2)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 2
+        )
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertNotIn(post.pk, [pk for pk, _ in
+                                   get_backend().search('Пост')])
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:post_detail', args=[post.pk])
+            ).status_code,
+            404,
+        )
+
+        moderation.hide_posts([post.pk], True)
+        self.assertEqual(self.posts_count(Group, self.spam.pk), 2)
+
+        moderation.hide_posts([post.pk], False)
+        self.assertIn(post, Post.objects.feed())
+        self.assertEqual(self.posts_count(Group, self.spam.pk), 3)
+        self.assertIn(post.pk, [pk for pk, _ in
+                                get_backend().search('Пост')])
+
+    def test_move_posts(self):
+        moved = self.posts[:2]
+        moderation.move_posts([post.pk for post in moved], self.trash.pk)
+        self.assertEqual(
+            Post.objects.filter(group=self.trash).count(), 2
+        )
+        self.assertEqual(self.posts_count(Group, self.spam.pk), 1)
+        self.assertEqual(self.posts_count(Group, self.trash.pk), 2)
+        self.trash.refresh_from_db()
+        self.assertEqual(self.trash.last_post_snippet, 'Пост 1')
+
+    def test_delete_posts_keeps_counters(self):
+        moderation.delete_posts([self.posts[0].pk])
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self.posts_count(Group, self.spam.pk), 2)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.reader).comments_count, 0
+        )
+
+    def test_hide_comments(self):
+        moderation.hide_comments([self.comment.pk], True)
+        post = Post.objects.get(pk=self.posts[0].pk)
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.reader).comments_count, 0
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertNotContains(response, 'Комментарий</p>')
+        # Удаление скрытого комментария не трогает счётчики второй раз.
+        moderation.delete_comments([self.comment.pk])
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).comments_count, 0
+        )
+
+
+class ModerationAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.posts = [
+            Post.objects.create(author=cls.admin, text=f'Пост {i}')
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+        # Рассылка созданных постов по лентам здесь не нужна.
+        Job.objects.all().delete()
+
+    def test_changelist_pages_by_cursor(self):
+        model_admin = site._registry[Post]
+        model_admin.list_per_page = 2
+        self.addCleanup(delattr, model_admin, 'list_per_page')
+        cl = self.client.get(self.url).context['cl']
+        self.assertEqual(
+            [post.pk for post in cl.result_list],
+            [self.posts[4].pk, self.posts[3].pk],
+        )
+        self.assertEqual(cl.result_count, 5)
+        self.assertFalse(cl.previous_url)
+
+        cl = self.client.get(self.url + cl.next_url).context['cl']
+        self.assertEqual(
+            [post.pk for post in cl.result_list],
+            [self.posts[2].pk, self.posts[1].pk],
+        )
+        self.assertTrue(cl.previous_url)
+        # Фильтры ведут на первую страницу.
+        self.assertNotIn(
+            CURSOR_PARAM, cl.get_query_string({'hidden__exact': 1})
+        )
+
+    def test_result_count_is_capped(self):
+        model_admin = site._registry[Post]
+        model_admin.count_limit = 3
+        self.addCleanup(delattr, model_admin, 'count_limit')
+        response = self.client.get(self.url)
+        self.assertEqual(str(response.context['cl'].result_count), '3+')
+        self.assertContains(response, '3+')
+
+    def run_action(self, action, **data):
+        return self.client.post(self.url, {
+            'action': action,
+            'select_across': 1,
+            'index': 0,
+            '_selected_action': [post.pk for post in self.posts],
+            **data,
+        }, follow=True)
+
+    def test_actions_queue_jobs(self):
+        response = self.run_action('hide_posts')
+        self.assertContains(response, 'Поставлено в очередь строк: 5.')
+        job = Job.objects.get()
+        self.assertEqual(job.func, 'posts.moderation.hide_posts')
+
+    def test_move_requires_group(self):
+        response = self.run_action('move_posts')
+        self.assertContains(response, 'Выберите группу для переноса.')
+        self.assertFalse(Job.objects.exists())
+
+        self.run_action('move_posts', group=self.group.pk)
+        job = Job.objects.get()
+        self.assertEqual(json.loads(job.args)[1], self.group.pk)
+
+    def test_group_filter_and_action_input_do_not_list_groups(self):
+        """Группы вводятся в поля, а не выводятся списком."""
+        Post.objects.filter(pk=self.posts[0].pk).update(group=self.group)
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Группа</a>')
+        self.assertNotContains(response, '<select name="group"')
+        self.assertContains(response, 'class="vForeignKeyRawIdAdminField"')
+
+        cl = self.client.get(self.url, {'group': 'group'}).context['cl']
+        self.assertEqual(
+            [post.pk for post in cl.result_list], [self.posts[0].pk]
+        )
+
+    def test_comment_post_and_author_are_read_only(self):
+        """Перенос комментария в форме сломал бы счётчики."""
+        comment = Comment.objects.create(
+            author=self.admin, post=self.posts[0], text='Комментарий'
+        )
+        response = self.client.get(
+            reverse('admin:posts_comment_change', args=[comment.pk])
+        )
+        form = response.context['adminform'].form
+        self.assertNotIn('post', form.fields)
+        self.assertNotIn('author', form.fields)
+        add = self.client.get(reverse('admin:posts_comment_add'))
+        self.assertIn('post', add.context['adminform'].form.fields)
+
+    def test_default_delete_is_disabled(self):
+        response = self.client.get(self.url)
+        actions = dict(response.context['action_form'].fields[
+            'action'
+        ].choices)
+        self.assertNotIn('delete_selected', actions)
+        self.assertIn('delete_posts', actions)
+
+    def test_comment_changelist(self):
+        Comment.objects.create(
+            author=self.admin, post=self.posts[0], text='Комментарий'
+        )
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist')
+        )
+        self.assertContains(response, 'Комментарий')
@@ -0,0 +1,167 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Comment, Group, Post
+from ..search import get_backend
+from ..transfer import import_content
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, BACKGROUND_WORKERS=0)
+class TransferTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        self.dump = os.path.join(self.workdir, 'content.ndjson')
+        self.media_dir = os.path.join(self.workdir, 'media')
+        self.user = User.objects.create_user(username='NoName')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        self.pub_date = timezone.now() - timedelta(days=3, microseconds=7)
+        Post.objects.filter(pk=self.post.pk).update(pub_date=self.pub_date)
+        self.comment = Comment.objects.create(
+            author=self.user, post=self.post, text='Тестовый комментарий'
+        )
+
+    def export(self):
+        call_command('export_content', self.dump, media_dir=self.media_dir,
+                     stdout=StringIO(), stderr=StringIO())
+
+    def import_(self, **options):
+        out = StringIO()
+        call_command('import_content', self.dump, media_dir=self.media_dir,
+                     stdout=out, **options)
+        return out.getvalue()
+
+    def test_round_trip(self):
+        """Выгрузка загружается в пустую базу без потерь."""
+        self.export()
+        image_name = self.post.image.name
+        self.assertTrue(
+            os.path.exists(os.path.join(self.media_dir, image_name))
+        )
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        get_backend().clear()
+
+        output = self.import_(batch_size=1)
+        self.assertIn('строк/с', output)
+        post = Post.objects.select_related(
+            'author__stats', 'group'
+        ).get(pk=self.post.pk)
+        self.assertEqual(post.text, 'Тестовый пост')
+        self.assertEqual(post.pub_date, self.pub_date)
+        self.assertEqual(post.author.username, 'NoName')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.group.slug, 'test_slug')
+        self.assertEqual(post.group.posts_count, 1)
+        self.assertEqual(post.author.stats.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        self.assertTrue(post.image.storage.exists(post.image.name))
+        # Картинка проходит ту же перекодировку, что и из формы.
+        self.assertTrue(post.image.name.endswith(
+            '.' + settings.POST_IMAGE_FORMAT.lower()
+        ))
+        self.assertEqual(
+            post.comments.get().text, 'Тестовый комментарий'
+        )
+        self.assertEqual(
+            get_backend().search('тестовый', None, 10)[0][0], post.pk
+        )
+        new_post = Post.objects.create(author=post.author, text='Новый')
+        self.assertGreater(new_post.pk, post.pk)
+
+    def test_import_keeps_model_dates_automatic(self):
+        """Во время загрузки новые посты получают дату как обычно."""
+        self.export()
+        Post.objects.all().delete()
+        dates = []
+
+        def progress(read):
+            dates.append(Post.objects.create(
+                author=self.user, text='Во время загрузки'
+            ).pub_date)
+
+        with open(self.dump, encoding='utf-8') as dump:
+            import_content(dump, self.media_dir, progress=progress)
+        self.assertTrue(dates)
+        self.assertNotIn(None, dates)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).pub_date, self.pub_date
+        )
+
+    def test_existing_rows_are_skipped(self):
+        """Повторная загрузка не создаёт дубликатов."""
+        self.export()
+        output = self.import_()
+        self.assertIn('Создано групп: 0, постов: 0, комментариев: 0',
+                      output)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_broken_line_is_reported(self):
+        """Ошибка формата прерывает загрузку с номером строки."""
+        with open(self.dump, 'w', encoding='utf-8') as dump:
+            dump.write('{"model": "posts.post"}\n')
+        with self.assertRaisesMessage(CommandError, 'Строка 1'):
+            self.import_()
+
+    def test_foreign_row_on_taken_key_is_rejected(self):
+        """Чужой пост с занятым ключом не подменяется местным."""
+        self.export()
+        Comment.objects.all().delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Местный пост')
+        with self.assertRaisesMessage(CommandError, 'занят другой строкой'):
+            self.import_()
+        self.assertFalse(Comment.objects.exists())
+
+    def test_hidden_rows_stay_hidden(self):
+        """Скрытые модератором пост и комментарий остаются скрытыми."""
+        Post.objects.filter(pk=self.post.pk).update(hidden=True)
+        Comment.objects.filter(pk=self.comment.pk).update(hidden=True)
+        self.export()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        get_backend().clear()
+
+        self.import_()
+        post = Post.objects.select_related('author__stats').get(
+            pk=self.post.pk
+        )
+        self.assertTrue(post.hidden)
+        self.assertTrue(post.comments.get().hidden)
+        self.assertEqual(post.author.stats.posts_count, 0)
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(get_backend().search('тестовый', None, 10), [])
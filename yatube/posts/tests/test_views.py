@@ -1,14 +1,25 @@
 import shutil
 import tempfile
+import time
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Comment, Group, Post
+from core.models import Job
+
+from ..cards import render_cards
+from ..models import Comment, Follow, Group, Post, TimelineEntry
 
 User = get_user_model()
 POSTS = 13
@@ -63,6 +74,7 @@ class ViewsTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -166,6 +178,7 @@ class PaginatorViewsTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         for post_temp in range(POSTS):
             Post.objects.create(
                 text=f'text{post_temp}', author=self.author, group=self.group
@@ -188,17 +201,836 @@ class PaginatorViewsTest(TestCase):
 
     def test_second_page_contains_three_records(self):
         templates_pages_names = {
-            'posts/index.html': reverse('posts:index') + '?page=2',
+            'posts/index.html': reverse('posts:index'),
             'posts/group_posts.html':
                 reverse('posts:group_posts',
-                        kwargs={'slug': self.group.slug}) + '?page=2',
+                        kwargs={'slug': self.group.slug}),
             'posts/profile.html':
                 reverse('posts:profile',
-                        kwargs={'username': self.author}) + '?page=2',
+                        kwargs={'username': self.author}),
         }
         for template, reverse_name in templates_pages_names.items():
             with self.subTest(reverse_name=reverse_name):
-                response = self.client.get(reverse_name)
+                first_page = self.client.get(reverse_name).context['page_obj']
+                response = self.client.get(
+                    reverse_name, {'cursor': first_page.next_cursor}
+                )
                 self.assertEqual(len(
                     response.context['page_obj']), SECOND_PAGE_POSTS
                 )
+
+    def test_cursor_pages_do_not_overlap(self):
+        """Страницы по курсору идут подряд без пропусков и повторов."""
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj'
+        ]
+        second_page = self.client.get(
+            reverse('posts:index'), {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        self.assertFalse(second_page.has_next())
+        self.assertEqual(
+            list(first_page) + list(second_page),
+            list(Post.objects.order_by('-pub_date', '-pk')),
+        )
+        back_page = self.client.get(
+            reverse('posts:index'), {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back_page), list(first_page))
+
+    def test_deep_page_query_does_not_count_or_offset(self):
+        """Страница по курсору не выполняет COUNT(*) и OFFSET."""
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj'
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                reverse('posts:index'), {'cursor': first_page.next_cursor}
+            )
+        sql = ' '.join(query['sql'] for query in queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Повреждённый курсор ведёт на первую страницу."""
+        response = self.client.get(reverse('posts:index'), {'cursor': '!!'})
+        self.assertEqual(len(response.context['page_obj']), POST_PER_PAGE)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='feed-slug',
+            description='Тестовое описание',
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        for number in range(POSTS):
+            Post.objects.create(
+                text=f'text{number}',
+                author=cls.authors[number % len(cls.authors)],
+                group=cls.group,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_pages_run_constant_number_of_queries(self):
+        """Число запросов на страницу ленты не зависит от числа постов."""
+        pages_queries = {
+            reverse('posts:index'): 1,
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}): 2,
+            reverse(
+                'posts:profile', kwargs={'username': self.authors[0]}
+            ): 2,
+        }
+        for reverse_name, queries in pages_queries.items():
+            with self.subTest(reverse_name=reverse_name):
+                with self.assertNumQueries(queries):
+                    self.client.get(reverse_name)
+                Post.objects.create(
+                    text='ещё пост', author=self.authors[0], group=self.group
+                )
+                with self.assertNumQueries(queries):
+                    self.client.get(reverse_name)
+
+    def test_profile_shows_posts_counter(self):
+        """Профиль показывает число постов из счётчика автора."""
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': self.authors[0]})
+        )
+        self.assertContains(
+            response,
+            f'Всего постов: {self.authors[0].posts.count()}',
+        )
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='card-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-card-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, text='Старый текст', group=self.group
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_card_fragment_is_shared_between_feeds(self):
+        """Фрагмент карточки из index используется в группе и профиле."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        pages = (
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for reverse_name in pages:
+            with self.subTest(reverse_name=reverse_name):
+                response = self.client.get(reverse_name)
+                self.assertContains(response, 'Старый текст')
+
+    def test_post_edit_bumps_card_version(self):
+        """Редактирование поста сбрасывает фрагмент карточки."""
+        self.client.get(reverse('posts:index'))
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[self.post.pk]),
+            data={'text': 'Новый текст', 'group': self.other_group.pk},
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).card_version,
+            self.post.card_version + 1,
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый текст')
+        self.assertNotContains(response, 'Старый текст')
+        self.assertContains(
+            response,
+            reverse('posts:group_posts', args=[self.other_group.slug]),
+        )
+
+    def test_author_rename_bumps_card_version(self):
+        """Новое имя автора попадает в карточки всех его постов."""
+        self.client.get(reverse('posts:index'))
+        author = User.objects.get(pk=self.user.pk)
+        author.last_name = 'Новая'
+        author.save()
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).card_version,
+            self.post.card_version + 1,
+        )
+        self.assertContains(self.client.get(reverse('posts:index')), 'Новая')
+
+    def test_password_change_keeps_cards(self):
+        """Сохранение без смены имени не сбрасывает карточки."""
+        author = User.objects.get(pk=self.user.pk)
+        author.set_password('new-password')
+        author.save()
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).card_version,
+            self.post.card_version,
+        )
+
+    def test_cards_rendered_once_per_post(self):
+        """Повторная отрисовка карточек берёт все фрагменты из кэша."""
+        posts = list(Post.objects.feed())
+        first = render_cards(posts)
+        with mock.patch('posts.cards.get_template') as get_template:
+            self.assertEqual(render_cards(posts), first)
+        get_template.assert_not_called()
+
+    def test_group_link_outside_fragment(self):
+        """Ссылка на группу есть в ленте, но не на странице группы."""
+        link = reverse('posts:group_posts', args=[self.group.slug])
+        posts = list(Post.objects.feed())
+        self.assertIn(link, render_cards(posts)[0])
+        self.assertNotIn(link, render_cards(posts, self.group)[0])
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='page-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-page-slug',
+            description='Тестовое описание',
+        )
+        cls.pages = {
+            'index': reverse('posts:index'),
+            'group': reverse(
+                'posts:group_posts', kwargs={'slug': cls.group.slug}
+            ),
+            'other_group': reverse(
+                'posts:group_posts', kwargs={'slug': cls.other_group.slug}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': cls.user.username}
+            ),
+        }
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def warm_up(self):
+        for url in self.pages.values():
+            self.client.get(url)
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный анонимный запрос отдаётся из кэша без запросов к БД."""
+        for name, url in self.pages.items():
+            with self.subTest(name=name):
+                self.assertEqual(
+                    self.client.get(url)['X-Page-Cache'], 'MISS'
+                )
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response['X-Page-Cache'], 'HIT')
+
+    def test_authorized_pages_are_not_cached(self):
+        """Авторизованный пользователь всегда получает свежую страницу."""
+        self.authorized_client.get(self.pages['index'])
+        response = self.authorized_client.get(self.pages['index'])
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_cursor_is_part_of_key(self):
+        """Страницы с разными курсорами кэшируются отдельно."""
+        self.client.get(self.pages['index'])
+        response = self.client.get(self.pages['index'], {'cursor': 'x'})
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+
+    def test_post_create_invalidates_affected_pages(self):
+        """Новый пост сбрасывает ленту, свою группу и профиль автора."""
+        self.warm_up()
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Новый пост', 'group': self.group.pk},
+        )
+        expected = {
+            'index': 'MISS',
+            'group': 'MISS',
+            'other_group': 'HIT',
+            'profile': 'MISS',
+        }
+        for name, state in expected.items():
+            with self.subTest(name=name):
+                response = self.client.get(self.pages[name])
+                self.assertEqual(response['X-Page-Cache'], state)
+
+    def test_post_edit_invalidates_old_and_new_group(self):
+        """Перенос поста в другую группу сбрасывает обе страницы групп."""
+        post = Post.objects.create(
+            author=self.user, text='Текст поста', group=self.group
+        )
+        self.warm_up()
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            data={'text': 'Текст поста', 'group': self.other_group.pk},
+        )
+        for name in ('group', 'other_group'):
+            with self.subTest(name=name):
+                response = self.client.get(self.pages[name])
+                self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertNotContains(
+            self.client.get(self.pages['group']), 'Текст поста'
+        )
+
+    def assert_feeds_dropped(self, slug):
+        for name in ('index', 'profile'):
+            with self.subTest(name=name):
+                response = self.client.get(self.pages[name])
+                self.assertEqual(response['X-Page-Cache'], 'MISS')
+                self.assertNotContains(response, slug)
+
+    def test_group_slug_change_invalidates_feeds(self):
+        """Лента и профиль не ссылаются на прежний slug группы."""
+        group = Group.objects.create(title='Группа', slug='old-slug')
+        Post.objects.create(author=self.user, text='Пост', group=group)
+        self.warm_up()
+        group.slug = 'new-slug'
+        group.save()
+        self.assert_feeds_dropped('old-slug')
+
+    def test_group_delete_invalidates_feeds(self):
+        """Лента и профиль не ссылаются на удалённую группу."""
+        group = Group.objects.create(title='Группа', slug='old-slug')
+        Post.objects.create(author=self.user, text='Пост', group=group)
+        self.warm_up()
+        group.delete()
+        self.assert_feeds_dropped('old-slug')
+
+    def test_stats_are_exposed_to_staff(self):
+        """Счётчики кэша доступны только персоналу."""
+        self.client.get(self.pages['index'])
+        self.client.get(self.pages['index'])
+        url = reverse('posts:page_cache_stats')
+        self.assertEqual(self.authorized_client.get(url).status_code, 302)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.json(), {'hits': 1, 'misses': 1})
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+        cls.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.user.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_unchanged_page_is_not_modified(self):
+        """Повторный запрос с ETag получает 304 без тела."""
+        for url in self.pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('no-cache', response['Cache-Control'])
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_not_modified_skips_view(self):
+        """304 ленты не трогает базу, 304 поста - один узкий запрос."""
+        for url, queries in zip(self.pages, (0, 0, 0, 1)):
+            etag = self.client.get(url)['ETag']
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_last_modified_for_anonymous(self):
+        """Анонимам отдаётся Last-Modified, If-Modified-Since даёт 304."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.authorized_client.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_new_csrf_token_gives_new_etag(self):
+        """После нового входа страница с формой не отдаётся из 304."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        # Первый ответ выдаёт CSRF-cookie.
+        self.authorized_client.get(url)
+        etag = self.authorized_client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.authorized_client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_give_new_etag(self):
+        """Новый пост и комментарий меняют ETag затронутых страниц."""
+        etags = [self.client.get(url)['ETag'] for url in self.pages]
+        Post.objects.create(author=self.user, text='Новый', group=self.group)
+        Comment.objects.create(
+            author=self.user, post=self.post, text='Комментарий'
+        )
+        for url, etag in zip(self.pages, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_feed_etag_expires(self):
+        """
+        ETag ленты живёт не дольше PAGE_GENERATION_TIMEOUT: сброс,
+        не дошедший до кэша этого процесса, не даёт 304 вечно.
+        """
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        later = time.time() + settings.PAGE_GENERATION_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user_and_cursor(self):
+        """Анонимная страница и страница пользователя различаются."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            url, {'cursor': 'broken'}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_page_has_no_validator(self):
+        """Страница 404 не получает ETag."""
+        response = self.client.get(
+            reverse('posts:group_posts', args=['missing'])
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, BACKGROUND_WORKERS=0)
+class ThumbnailTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='NoName')
+        self.small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+
+    def upload(self, name):
+        return SimpleUploadedFile(
+            name=name, content=self.small_gif, content_type='image/gif'
+        )
+
+    def test_thumbnail_is_built_after_commit(self):
+        """Миниатюра строится после сохранения картинки."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', image=self.upload('a.gif')
+        )
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url.startswith(settings.MEDIA_URL))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.thumbnail_url)
+
+    def test_image_change_rebuilds_thumbnail(self):
+        """Замена картинки строит новую миниатюру."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', image=self.upload('a.gif')
+        )
+        post.refresh_from_db()
+        old_url = post.thumbnail_url
+        post.image = self.upload('b.gif')
+        post.save()
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url)
+        self.assertNotEqual(post.thumbnail_url, old_url)
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, в карточке показывается заглушка."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', image=self.upload('a.gif')
+        )
+        Post.objects.filter(pk=post.pk).update(
+            thumbnail_url='', card_version=100
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'bg-light')
+        self.assertNotContains(response, '<img class="card-img')
+
+
+class CommentsPaginationTest(TestCase):
+    COMMENTS = 25
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        for number in range(cls.COMMENTS):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader{number}'),
+                text=f'Комментарий {number}',
+            )
+        cls.url = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.json_url = reverse('posts:post_comments', args=[cls.post.pk])
+
+    def test_post_detail_shows_first_comments_page(self):
+        """post_detail выводит первую страницу комментариев."""
+        response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, f'Комментарий {self.COMMENTS - 1}')
+        self.assertContains(response, comments.next_cursor)
+
+    def test_post_detail_queries_do_not_depend_on_comments(self):
+        """Число запросов post_detail не зависит от числа комментариев."""
+        # Версия для ETag, пост с автором и группой, страница комментариев.
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+    def test_json_endpoint_returns_next_comments(self):
+        """JSON-эндпоинт отдаёт следующую страницу комментариев."""
+        first_page = self.client.get(self.url).context['comments']
+        response = self.client.get(
+            self.json_url, {'cursor': first_page.next_cursor}
+        )
+        data = response.json()
+        self.assertEqual(
+            len(data['comments']),
+            self.COMMENTS - settings.COMMENTS_PER_PAGE,
+        )
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['comments'][-1]['text'], 'Комментарий 0')
+        self.assertEqual(data['comments'][-1]['author'], 'reader0')
+
+    def test_json_endpoint_unknown_post(self):
+        """Для несуществующего поста эндпоинт отвечает 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Садоводство',
+            slug='garden',
+            description='Тестовое описание',
+        )
+        cls.cat_post = Post.objects.create(
+            author=cls.user, text='Кот спит на окне'
+        )
+        cls.garden_post = Post.objects.create(
+            author=cls.user, text='Весной сажаем', group=cls.group
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def found(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return list(response.context['page_obj'])
+
+    def test_search_by_text_group_and_author(self):
+        """Поиск находит посты по тексту, названию группы и автору."""
+        cases = {
+            'кот': [self.cat_post],
+            'садовод': [self.garden_post],
+            'толстой': [self.garden_post, self.cat_post],
+            'собака': [],
+        }
+        for query, expected in cases.items():
+            with self.subTest(query=query):
+                self.assertCountEqual(self.found(query), expected)
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при редактировании и удалении поста."""
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[self.cat_post.pk]),
+            data={'text': 'Пёс спит на окне'},
+        )
+        self.assertEqual(self.found('кот'), [])
+        self.assertEqual(self.found('пёс'), [self.cat_post])
+        Post.objects.get(pk=self.cat_post.pk).delete()
+        self.assertEqual(self.found('пёс'), [])
+
+    def test_group_rename_reindexes_posts(self):
+        """Переименование группы обновляет индекс её постов."""
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Огород'
+        group.save()
+        # Переиндексация идёт фоновой задачей после коммита.
+        self.assertEqual(self.found('огород'), [])
+        call_command('run_jobs', once=True, workers=0, stdout=StringIO())
+        self.assertEqual(self.found('огород'), [self.garden_post])
+
+    def test_author_save_without_rename_is_not_reindexed(self):
+        """Смена пароля не ставит переиндексацию постов автора."""
+        author = User.objects.get(pk=self.user.pk)
+        author.set_password('new-password')
+        author.save()
+        self.assertFalse(
+            Job.objects.filter(func='posts.search.reindex_author').exists()
+        )
+        author.first_name = 'Николай'
+        author.save()
+        self.assertTrue(
+            Job.objects.filter(func='posts.search.reindex_author').exists()
+        )
+
+    def test_results_are_paginated_by_cursor(self):
+        """Результаты делятся на страницы курсором без повторов."""
+        for number in range(POSTS):
+            Post.objects.create(author=self.user, text=f'сова {number}')
+        response = self.client.get(reverse('posts:search'), {'q': 'сова'})
+        first_page = response.context['page_obj']
+        second_page = self.found('сова', cursor=first_page.next_cursor)
+        self.assertEqual(len(first_page), POST_PER_PAGE)
+        self.assertEqual(len(second_page), SECOND_PAGE_POSTS)
+        self.assertFalse(set(first_page) & set(second_page))
+
+    def test_search_runs_constant_number_of_queries(self):
+        """Поиск делает запрос к индексу и один запрос за постами."""
+        with self.assertNumQueries(2):
+            self.client.get(reverse('posts:search'), {'q': 'толстой'})
+
+    def test_search_api(self):
+        """API поиска отдаёт результаты в JSON."""
+        response = self.client.get(reverse('posts:search_api'), {'q': 'кот'})
+        data = response.json()
+        self.assertEqual(
+            [item['id'] for item in data['results']], [self.cat_post.pk]
+        )
+        self.assertIsNone(data['next_cursor'])
+
+    def test_rebuild_search_index(self):
+        """rebuild_search_index заново заполняет индекс."""
+        from ..search import get_backend
+        get_backend().clear()
+        self.assertEqual(self.found('кот'), [])
+        call_command('rebuild_search_index', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.found('кот'), [self.cat_post])
+
+
+@override_settings(BACKGROUND_WORKERS=0)
+class FollowTimelineTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='Reader')
+        self.author = User.objects.create_user(username='Author')
+        self.stranger = User.objects.create_user(username='Stranger')
+        self.client.force_login(self.reader)
+
+    def follow(self, author):
+        return self.client.get(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+
+    def timeline(self, cursor=None):
+        params = {'cursor': cursor} if cursor else {}
+        response = self.client.get(reverse('posts:follow_index'), params)
+        return response.context['page_obj']
+
+    def test_follow_and_unfollow(self):
+        """Подписка создаётся один раз, отписка её удаляет."""
+        self.follow(self.author)
+        self.follow(self.author)
+        self.follow(self.reader)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(Follow.objects.exists())
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.followers_count, 0)
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост попадает только в ленты подписчиков автора."""
+        self.follow(self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        Post.objects.create(author=self.stranger, text='Чужой пост')
+        self.assertEqual(list(self.timeline()), [post])
+        self.assertFalse(TimelineEntry.objects.exclude(user=self.reader))
+
+    def test_follow_backfills_and_unfollow_clears_timeline(self):
+        """При подписке в ленту попадают старые посты, при отписке уходят."""
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.follow(self.author)
+        self.assertEqual(list(self.timeline()), [post])
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(list(self.timeline()), [])
+
+    def test_popular_authors_are_merged_on_read(self):
+        """Посты популярных авторов не рассылаются, а подмешиваются."""
+        self.follow(self.author)
+        self.follow(self.stranger)
+        with self.settings(FOLLOW_FANOUT_LIMIT=0):
+            for number in range(POSTS):
+                Post.objects.create(
+                    author=self.stranger, text=f'Популярный {number}'
+                )
+        Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertEqual(TimelineEntry.objects.count(), 1)
+        with self.settings(FOLLOW_FANOUT_LIMIT=0):
+            first_page = self.timeline()
+            second_page = self.timeline(first_page.next_cursor)
+        self.assertEqual(len(first_page), POST_PER_PAGE)
+        self.assertEqual(len(second_page), POSTS + 1 - POST_PER_PAGE)
+        self.assertFalse(set(first_page) & set(second_page))
+        self.assertEqual(first_page[0].text, 'Тестовый пост')
+
+    def test_timeline_reads_constant_number_of_queries(self):
+        """Лента читается запросом к индексу и запросом популярных авторов."""
+        self.follow(self.author)
+        for number in range(POSTS):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        with CaptureQueriesContext(connection) as queries:
+            self.timeline()
+        timeline_queries = [
+            query['sql'] for query in queries
+            if 'posts_timelineentry' in query['sql']
+            or 'posts_follow' in query['sql']
+        ]
+        self.assertEqual(len(timeline_queries), 2)
+
+
+class GroupDirectoryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='NoName')
+        self.groups = [
+            Group.objects.create(
+                title=title, slug=slug, description='Тестовое описание'
+            )
+            for title, slug in (('Бобры', 'beavers'), ('Аисты', 'storks'),
+                                ('Волки', 'wolves'))
+        ]
+        self.url = reverse('posts:group_index')
+
+    def directory(self, **params):
+        return self.client.get(self.url, params).context['page_obj']
+
+    def test_groups_are_listed_by_title(self):
+        """Каталог упорядочен по названию группы."""
+        self.assertEqual(
+            [group.title for group in self.directory()],
+            ['Аисты', 'Бобры', 'Волки'],
+        )
+
+    @override_settings(GROUPS_PER_PAGE=2)
+    def test_directory_is_paginated_by_cursor(self):
+        """Страницы каталога листаются курсором в обе стороны."""
+        first_page = self.directory()
+        second_page = self.directory(cursor=first_page.next_cursor)
+        self.assertEqual(len(first_page), 2)
+        self.assertEqual([group.title for group in second_page], ['Волки'])
+        previous_page = self.directory(cursor=second_page.previous_cursor)
+        self.assertEqual(list(previous_page), list(first_page))
+
+    def test_latest_post_follows_changes(self):
+        """Последний пост группы следует за созданием, правкой и удалением."""
+        group = self.groups[0]
+        first = Post.objects.create(author=self.user, text='Первый',
+                                    group=group)
+        second = Post.objects.create(author=self.user, text='Второй',
+                                     group=group)
+        group.refresh_from_db()
+        self.assertEqual(group.last_post_snippet, 'Второй')
+        self.assertEqual(group.last_post_at, second.pub_date)
+        self.assertContains(self.client.get(self.url), 'Второй')
+
+        second.text = 'Второй, исправленный'
+        second.save()
+        group.refresh_from_db()
+        self.assertEqual(group.last_post_snippet, 'Второй, исправленный')
+
+        second.group = self.groups[1]
+        second.save()
+        group.refresh_from_db()
+        self.assertEqual(group.last_post_snippet, 'Первый')
+
+        Post.objects.get(pk=first.pk).delete()
+        group.refresh_from_db()
+        self.assertIsNone(group.last_post_at)
+        self.assertEqual(group.last_post_snippet, '')
+        self.assertEqual(group.posts_count, 0)
+
+    def test_rebuild_counters_fills_latest_post(self):
+        """rebuild_counters заполняет последний пост группы."""
+        group = self.groups[2]
+        Post.objects.create(author=self.user, text='Пост', group=group)
+        Group.objects.update(last_post_at=None, last_post_snippet='')
+        call_command('rebuild_counters', stdout=StringIO())
+        group.refresh_from_db()
+        self.assertEqual(group.last_post_snippet, 'Пост')
+        self.assertIsNotNone(group.last_post_at)
+
+    def test_directory_runs_one_query(self):
+        """Каталог с последними постами читается одним запросом."""
+        for group in self.groups:
+            Post.objects.create(author=self.user, text='Пост', group=group)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db.models import F
+from sorl.thumbnail import get_thumbnail
+
+from core.jobs import enqueue
+
+from .models import Post
+from .page_cache import invalidate_feeds
+
+
+def generate_thumbnail(post_id, image_name):
+    """
+    Построить миниатюру картинки поста и сохранить её адрес.
+
+    Если картинку успели заменить, результат отбрасывается: за новой
+    картинкой уже поставлена своя задача.
+    """
+    post = Post.objects.filter(pk=post_id, image=image_name).first()
+    if post is None:
+        return
+    thumbnail = get_thumbnail(
+        post.image,
+        settings.POST_THUMBNAIL_GEOMETRY,
+        crop='center',
+        upscale=True,
+    )
+    updated = Post.objects.filter(pk=post_id, image=image_name).update(
+        thumbnail_url=thumbnail.url,
+        card_version=F('card_version') + 1,
+    )
+    if updated:
+        invalidate_feeds([post.author_id], [post.group_id])
+
+
+def schedule_thumbnail(post):
+    """Поставить построение миниатюры в очередь фоновых задач."""
+    enqueue(generate_thumbnail, post.pk, post.image.name)
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db.models import Subquery
+
+from core.jobs import enqueue
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .utils import NEXT, CursorPage, CursorPaginator, encode_cursor
+
+FANOUT_CHUNK = 500
+
+
+def is_fanned_out(author_id):
+    """Рассылаются ли посты автора по лентам подписчиков."""
+    return not AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.FOLLOW_FANOUT_LIMIT,
+    ).exists()
+
+
+def _insert(entries):
+    for start in range(0, len(entries), FANOUT_CHUNK):
+        TimelineEntry.objects.bulk_create(
+            entries[start:start + FANOUT_CHUNK], ignore_conflicts=True
+        )
+
+
+def fan_out_post(post_id):
+    """Добавить пост в ленты всех подписчиков его автора."""
+    post = Post.objects.visible().filter(pk=post_id).only(
+        'author_id', 'pub_date'
+    ).first()
+    if post is None or not is_fanned_out(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    chunk = []
+    for user_id in followers.iterator(chunk_size=FANOUT_CHUNK):
+        chunk.append(TimelineEntry(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        ))
+        if len(chunk) == FANOUT_CHUNK:
+            _insert(chunk)
+            chunk = []
+    _insert(chunk)
+
+
+def backfill_timeline(user_id, author_id):
+    """Положить в ленту новые подписки последние посты автора."""
+    if not is_fanned_out(author_id):
+        return
+    posts = Post.objects.visible().filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:settings.FOLLOW_BACKFILL_POSTS]
+    _insert([
+        TimelineEntry(user_id=user_id, post_id=pk, author_id=author_id,
+                      pub_date=pub_date)
+        for pk, pub_date in posts
+    ])
+
+
+def schedule_fan_out(post):
+    enqueue(fan_out_post, post.pk)
+
+
+def schedule_backfill(follow):
+    enqueue(backfill_timeline, follow.user_id, follow.author_id)
+
+
+def unfollow_timeline(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+
+
+def timeline_page(user, cursor=None, per_page=settings.POST_PER_PAGE):
+    """
+    Страница ленты подписок пользователя.
+
+    Основная часть читается одним проходом по индексу
+    (user, -pub_date, -post); посты авторов, которых не рассылают
+    по лентам, подмешиваются отдельным запросом с тем же курсором.
+    Лента листается только вперёд.
+    """
+    entries = CursorPaginator(
+        TimelineEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group'
+        ),
+        per_page,
+        key=('pub_date', 'post_id'),
+    ).page(cursor)
+    popular = Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.FOLLOW_FANOUT_LIMIT,
+    ).values('author_id')
+    merged = CursorPaginator(
+        Post.objects.feed().filter(author__in=Subquery(popular)),
+        per_page,
+    ).page(cursor)
+
+    posts = {entry.post.pk: entry.post for entry in entries}
+    posts.update((post.pk, post) for post in merged)
+    rows = sorted(posts.values(), key=lambda post: (post.pub_date, post.pk),
+                  reverse=True)
+    has_next = (
+        len(rows) > per_page or entries.has_next() or merged.has_next()
+    )
+    rows = rows[:per_page]
+    next_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(
+            NEXT, [rows[-1].pub_date.isoformat(), rows[-1].pk]
+        )
+    return CursorPage(rows, None, next_cursor, None)
@@ -0,0 +1,321 @@
+import json
+import os
+import shutil
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+
+from core.jobs import enqueue
+
+from .management.commands.rebuild_counters import rebuild_counters
+from .models import Comment, Group, Post
+from .images import store_image
+from .page_cache import invalidate_feeds
+from .search import index_posts
+from .thumbnails import generate_thumbnail
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+GROUP = 'posts.group'
+POST = 'posts.post'
+COMMENT = 'posts.comment'
+
+
+class TransferError(Exception):
+    """Строка выгрузки не может быть загружена."""
+
+
+def _line(model, pk, fields):
+    return json.dumps(
+        {'model': model, 'pk': pk, 'fields': fields}, ensure_ascii=False
+    ) + '\n'
+
+
+def _copy_image(name, media_dir):
+    """Потоково скопировать файл картинки из хранилища в media_dir."""
+    if not default_storage.exists(name):
+        return
+    target = os.path.join(media_dir, name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with default_storage.open(name) as source, open(target, 'wb') as copy:
+        shutil.copyfileobj(source, copy)
+
+
+def export_content(stream, media_dir=None, batch_size=BATCH_SIZE,
+                   progress=None):
+    """
+    Записать группы, посты и комментарии в stream построчно в NDJSON.
+
+    Авторы записываются именами, группы - slug, поэтому выгрузку можно
+    загрузить в базу с другими первичными ключами пользователей и групп.
+    Скрытые модератором посты и комментарии выгружаются с флагом hidden.
+    Картинки копируются в media_dir, если он указан.
+    """
+    written = 0
+    groups = Group.objects.order_by('pk').values(
+        'pk', 'title', 'slug', 'description'
+    )
+    for row in groups.iterator(chunk_size=batch_size):
+        stream.write(_line(GROUP, row.pop('pk'), row))
+        written += 1
+    posts = Post.objects.order_by('pk').values_list(
+        'pk', 'text', 'pub_date', 'author__username', 'group__slug', 'image',
+        'hidden',
+    )
+    for pk, text, pub_date, author, group, image, hidden in posts.iterator(
+        chunk_size=batch_size
+    ):
+        stream.write(_line(POST, pk, {
+            'text': text, 'pub_date': pub_date.isoformat(), 'author': author,
+            'group': group, 'image': image, 'hidden': hidden,
+        }))
+        if image and media_dir:
+            _copy_image(image, media_dir)
+        written += 1
+        if progress and written % batch_size == 0:
+            progress(written)
+    comments = Comment.objects.order_by('pk').values_list(
+        'pk', 'post_id', 'author__username', 'text', 'created', 'hidden'
+    )
+    for pk, post, author, text, created, hidden in comments.iterator(
+        chunk_size=batch_size
+    ):
+        stream.write(_line(COMMENT, pk, {
+            'post': post, 'author': author, 'text': text,
+            'created': created.isoformat(), 'hidden': hidden,
+        }))
+        written += 1
+        if progress and written % batch_size == 0:
+            progress(written)
+    if progress:
+        progress(written)
+    return written
+
+
+def _restore_dates(model, objects, name, dates):
+    """
+    Вернуть строкам даты из выгрузки.
+
+    bulk_create заполняет поле с auto_now_add текущим временем, поэтому
+    даты пишутся вторым запросом на пачку, а не сменой auto_now_add
+    у общего поля модели, которое видят остальные потоки процесса.
+    """
+    for obj, date in zip(objects, dates):
+        setattr(obj, name, date)
+    model.objects.bulk_update(objects, [name])
+
+
+class Importer:
+    """Загрузка NDJSON пачками по batch_size строк одной модели."""
+
+    def __init__(self, media_dir=None, batch_size=BATCH_SIZE, progress=None):
+        self.media_dir = media_dir
+        self.batch_size = batch_size
+        self.progress = progress
+        self.pending_model = None
+        self.pending = []
+        self.read = 0
+        self.created = {GROUP: 0, POST: 0, COMMENT: 0}
+
+    def feed(self, lines):
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                model, fields = record['model'], record['fields']
+            except (ValueError, KeyError, TypeError):
+                raise TransferError(f'Строка {number}: неверный формат')
+            if model not in self.created:
+                raise TransferError(
+                    f'Строка {number}: неизвестная модель {model}'
+                )
+            if model != GROUP and record.get('pk') is None:
+                raise TransferError(f'Строка {number}: нет первичного ключа')
+            if model != self.pending_model:
+                self.flush()
+                self.pending_model = model
+            self.pending.append((number, record.get('pk'), fields))
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+        self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        load = {
+            GROUP: self._load_groups,
+            POST: self._load_posts,
+            COMMENT: self._load_comments,
+        }[self.pending_model]
+        self.created[self.pending_model] += load(self.pending)
+        self.read += len(self.pending)
+        self.pending = []
+        if self.progress:
+            self.progress(self.read)
+
+    def _authors(self, rows):
+        """Найти авторов одним запросом; недостающих создать."""
+        names = {fields['author'] for _, _, fields in rows}
+        found = dict(User.objects.filter(
+            username__in=names
+        ).values_list('username', 'pk'))
+        missing = []
+        for name in names - set(found):
+            user = User(username=name)
+            user.set_unusable_password()
+            missing.append(user)
+        if missing:
+            User.objects.bulk_create(missing)
+            found.update(User.objects.filter(
+                username__in=[user.username for user in missing]
+            ).values_list('username', 'pk'))
+        return found
+
+    def _new(self, model, rows, lookups, identity):
+        """
+        Отбросить строки, загруженные раньше, по их первичным ключам.
+
+        Ключ, занятый другой строкой (lookups в базе не совпали
+        с identity(fields)), - ошибка: иначе комментарии из выгрузки
+        попали бы к чужому посту.
+        """
+        existing = {
+            pk: tuple(values) for pk, *values in model.objects.filter(
+                pk__in=[pk for _, pk, _ in rows]
+            ).values_list('pk', *lookups)
+        }
+        new = []
+        for number, pk, fields in rows:
+            if pk not in existing:
+                new.append((number, pk, fields))
+            elif existing[pk] != identity(fields):
+                raise TransferError(
+                    f'Строка {number}: ключ {pk} занят другой строкой'
+                )
+        return new
+
+    def _load_groups(self, rows):
+        slugs = {fields['slug'] for _, _, fields in rows}
+        existing = set(Group.objects.filter(
+            slug__in=slugs
+        ).values_list('slug', flat=True))
+        groups = [
+            Group(title=fields['title'], slug=fields['slug'],
+                  description=fields['description'])
+            for _, _, fields in rows if fields['slug'] not in existing
+        ]
+        Group.objects.bulk_create(groups)
+        return len(groups)
+
+    def _store_image(self, number, name):
+        """Перекодировать картинку из media_dir, как при загрузке в форму."""
+        if not name or not self.media_dir:
+            return name or ''
+        try:
+            with open(os.path.join(self.media_dir, name), 'rb') as source:
+                return store_image(source)
+        except (OSError, Image.DecompressionBombError):
+            raise TransferError(
+                f'Строка {number}: не удалось загрузить картинку {name}'
+            )
+
+    def _load_posts(self, rows):
+        rows = self._new(
+            Post, rows, ('author__username', 'pub_date', 'text'),
+            lambda fields: (fields['author'],
+                            parse_datetime(fields['pub_date']),
+                            fields['text']),
+        )
+        authors = self._authors(rows)
+        slugs = {fields['group'] for _, _, fields in rows if fields['group']}
+        groups = dict(Group.objects.filter(
+            slug__in=slugs
+        ).values_list('slug', 'pk'))
+        posts = []
+        for number, pk, fields in rows:
+            if fields['group'] and fields['group'] not in groups:
+                raise TransferError(
+                    f'Строка {number}: нет группы {fields["group"]}'
+                )
+            posts.append(Post(
+                pk=pk,
+                text=fields['text'],
+                pub_date=parse_datetime(fields['pub_date']),
+                author_id=authors[fields['author']],
+                group_id=groups.get(fields['group']),
+                image=self._store_image(number, fields['image']),
+                # Выгрузки до появления модерации флага не содержат.
+                hidden=fields.get('hidden', False),
+            ))
+        Post.objects.bulk_create(posts)
+        _restore_dates(Post, posts, 'pub_date', [
+            parse_datetime(fields['pub_date']) for _, _, fields in rows
+        ])
+        invalidate_feeds(set(authors.values()), set(groups.values()))
+        index_posts(Post.objects.visible().filter(
+            pk__in=[post.pk for post in posts]
+        ))
+        for post in posts:
+            if post.image:
+                enqueue(generate_thumbnail, post.pk, post.image.name)
+        return len(posts)
+
+    def _load_comments(self, rows):
+        rows = self._new(
+            Comment, rows, ('post_id', 'author__username', 'created', 'text'),
+            lambda fields: (fields['post'], fields['author'],
+                            parse_datetime(fields['created']),
+                            fields['text']),
+        )
+        authors = self._authors(rows)
+        post_ids = set(Post.objects.filter(
+            pk__in={fields['post'] for _, _, fields in rows}
+        ).values_list('pk', flat=True))
+        comments = []
+        for number, pk, fields in rows:
+            if fields['post'] not in post_ids:
+                raise TransferError(
+                    f'Строка {number}: нет поста {fields["post"]}'
+                )
+            comments.append(Comment(
+                pk=pk,
+                post_id=fields['post'],
+                author_id=authors[fields['author']],
+                text=fields['text'],
+                created=parse_datetime(fields['created']),
+                hidden=fields.get('hidden', False),
+            ))
+        Comment.objects.bulk_create(comments)
+        _restore_dates(Comment, comments, 'created', [
+            parse_datetime(fields['created']) for _, _, fields in rows
+        ])
+        invalidate_feeds(set(authors.values()))
+        return len(comments)
+
+
+def import_content(lines, media_dir=None, batch_size=BATCH_SIZE,
+                   progress=None):
+    """
+    Загрузить строки NDJSON из export_content в одной транзакции.
+
+    Вставка идёт через bulk_create, поэтому сигналы не срабатывают:
+    счётчики пересчитываются в конце, поисковый индекс и кэш страниц
+    обновляются по пачкам, миниатюры строятся в фоне после коммита.
+    Ленты подписок старыми постами не заполняются.
+    """
+    importer = Importer(media_dir, batch_size, progress)
+    with transaction.atomic():
+        importer.feed(lines)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [Post, Comment]
+            ):
+                cursor.execute(sql)
+        rebuild_counters()
+    return importer.created
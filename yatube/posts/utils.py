@@ -1,10 +1,167 @@
-from django.core.paginator import Paginator
+import base64
+import json
 
-from yatube.settings import POST_PER_PAGE
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
 
+from yatube.settings import COMMENTS_PER_PAGE, POST_PER_PAGE
 
-def paginator(request, post_list):
-    paginator = Paginator(post_list, POST_PER_PAGE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+CURSOR_PARAM = 'cursor'
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, values):
+    """Упаковать направление и значения ключа в непрозрачный токен."""
+    raw = json.dumps([direction, *values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковать токен; вернуть None, если он повреждён."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, *values = json.loads(base64.urlsafe_b64decode(padded))
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS):
+        return None
+    return direction, values
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинации с токенами соседних страниц."""
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<CursorPage of %s items>' % len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-пагинация по убыванию ключа (по умолчанию pub_date, pk).
+
+    Страница выбирается условием на ключ вместо OFFSET, поэтому стоимость
+    любой страницы одинакова, а COUNT(*) не выполняется, пока кто-то
+    явно не обратится к count. descending=False листает по возрастанию.
+    """
+
+    def __init__(self, object_list, per_page, key=('pub_date', 'pk'),
+                 descending=True):
+        prefix = '-' if descending else ''
+        super().__init__(object_list.order_by(*(prefix + f for f in key)),
+                         per_page)
+        self.key = key
+        self.forward, self.backward = (
+            ('lt', 'gt') if descending else ('gt', 'lt')
+        )
+
+    def _key_values(self, obj):
+        values = []
+        for name in self.key:
+            value = getattr(obj, name)
+            values.append(value.isoformat()
+                          if hasattr(value, 'isoformat') else value)
+        return values
+
+    def _parse_values(self, values):
+        opts = self.object_list.model._meta
+        fields = [opts.pk if name == 'pk' else opts.get_field(name)
+                  for name in self.key]
+        if len(values) != len(fields):
+            raise ValueError
+        return [field.to_python(v) for field, v in zip(fields, values)]
+
+    def _seek(self, values, lookup):
+        condition = Q()
+        for i, name in enumerate(self.key):
+            step = Q(**{f'{name}__{lookup}': values[i]})
+            for prev_name, prev_value in zip(self.key[:i], values[:i]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def _position(self, cursor):
+        """
+        Направление, значения ключа и строки после позиции из токена.
+
+        Повреждённый токен означает начало ленты (значения None).
+        """
+        direction, values = NEXT, None
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is not None:
+            try:
+                direction, values = decoded[0], self._parse_values(decoded[1])
+            except (TypeError, ValueError, ValidationError):
+                direction, values = NEXT, None
+
+        queryset = self.object_list
+        if values is not None and direction == NEXT:
+            queryset = queryset.filter(self._seek(values, self.forward))
+        elif values is not None:
+            queryset = queryset.filter(
+                self._seek(values, self.backward)
+            ).reverse()
+        return direction, values, queryset
+
+    def _cursors(self, rows, has_next, has_previous):
+        """Токены следующей и предыдущей страниц для строк rows."""
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(NEXT, self._key_values(rows[-1]))
+        if rows and has_previous:
+            previous_cursor = encode_cursor(
+                PREVIOUS, self._key_values(rows[0])
+            )
+        return next_cursor, previous_cursor
+
+    def page(self, cursor=None):
+        """Вернуть страницу после (или перед) позицией из токена."""
+        direction, values, queryset = self._position(cursor)
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS and not has_more:
+            # Дошли до начала ленты: показываем полную первую страницу.
+            return self.page()
+        if direction == PREVIOUS:
+            rows.reverse()
+
+        if direction == NEXT:
+            has_next, has_previous = has_more, values is not None
+        else:
+            has_next, has_previous = True, has_more
+        return CursorPage(
+            rows, self, *self._cursors(rows, has_next, has_previous)
+        )
+
+    def get_page(self, cursor=None):
+        return self.page(cursor)
+
+
+def paginator(request, post_list, key=('pub_date', 'pk'),
+              per_page=POST_PER_PAGE, descending=True):
+    paginator = CursorPaginator(post_list, per_page, key, descending)
+    page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
     return page_obj
+
+
+def comments_paginator(request, post):
+    """Страница видимых комментариев поста вместе с авторами."""
+    return paginator(
+        request,
+        post.comments.filter(hidden=False).select_related('author'),
+        key=('created', 'pk'),
+        per_page=COMMENTS_PER_PAGE,
+    )
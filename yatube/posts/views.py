@@ -1,46 +1,111 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.db.models import SlugField
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 
-from .forms import CommentForm, PostForm
-from .models import Group, Post
-from .utils import paginator
+from core.db import read_replica
+from core.fanout import gather
+from core.ratelimit import ratelimit
+from core.uploads import oversized_fields
+
+from .forms import CommentForm, PostForm, PostImageForm
+from .models import Follow, Group, Post
+from .page_cache import (cache_anonymous_page, conditional_feed,
+                         conditional_page, group_scope, groups_scope,
+                         index_scope, post_version, profile_scope)
+from .page_cache import stats as page_cache_stats_data
+from .search import search_page
+from .timeline import timeline_page
+from .utils import CURSOR_PARAM, comments_paginator, paginator
 
 User = get_user_model()
 
 
+@read_replica
+@conditional_feed(index_scope)
+@cache_anonymous_page(index_scope)
 def index(request: HttpRequest) -> HttpResponse:
     """Вернуть HttpResponse объекта главной страницы"""
-    post_list = Post.objects.select_related("group")
+    post_list = Post.objects.feed()
     page_obj = paginator(request, post_list)
     return render(request, "posts/index.html", {'page_obj': page_obj})
 
 
+@read_replica
+@conditional_feed(group_scope)
+@cache_anonymous_page(group_scope)
 def group_posts(request: HttpRequest, slug: SlugField) -> HttpResponse:
     """Вернуть HttpResponse объекта страницы группы"""
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.select_related("group", "author")
-    page_obj = paginator(request, post_list)
+    group, page_obj = gather(
+        lambda: get_object_or_404(Group, slug=slug),
+        lambda: paginator(
+            request, Post.objects.feed().filter(group__slug=slug)
+        ),
+    )
     context = {"group": group, "page_obj": page_obj}
     return render(request, "posts/group_list.html", context)
 
 
+@read_replica
+@conditional_feed(groups_scope)
+@cache_anonymous_page(groups_scope)
+def group_index(request):
+    """Вернуть каталог групп с числом постов и последним постом."""
+    group_list = Group.objects.only(
+        "title", "slug", "posts_count", "last_post_at", "last_post_snippet"
+    )
+    page_obj = paginator(
+        request,
+        group_list,
+        key=("title", "pk"),
+        per_page=settings.GROUPS_PER_PAGE,
+        descending=False,
+    )
+    return render(request, "posts/groups.html", {"page_obj": page_obj})
+
+
+@read_replica
+@conditional_feed(profile_scope)
+@cache_anonymous_page(profile_scope)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.select_related("group")
-    page_obj = paginator(request, post_list)
+    calls = [
+        lambda: get_object_or_404(
+            User.objects.select_related("stats"), username=username
+        ),
+        lambda: paginator(
+            request,
+            Post.objects.feed().filter(author__username=username),
+        ),
+    ]
+    if request.user.is_authenticated:
+        calls.append(lambda: Follow.objects.filter(
+            user=request.user, author__username=username
+        ).exists())
+    author, page_obj, *following = gather(*calls)
     context = {
         "author": author,
         "page_obj": page_obj,
     }
+    if following:
+        context["following"] = following[0]
     return render(request, 'posts/profile.html', context)
 
 
+@read_replica
+@conditional_page(post_version)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post, comments = gather(
+        lambda: get_object_or_404(
+            Post.objects.visible().select_related("author__stats", "group"),
+            pk=post_id,
+        ),
+        lambda: comments_paginator(request, Post(pk=post_id)),
+    )
     form = CommentForm(
         request.POST or None
     )
@@ -52,21 +117,85 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def search(request):
+    """Вернуть страницу поиска по текстам, группам и авторам постов."""
+    query = request.GET.get("q", "").strip()
+    page_obj = search_page(query, request.GET.get(CURSOR_PARAM))
+    context = {"query": query, "page_obj": page_obj}
+    return render(request, "posts/search.html", context)
+
+
+def search_api(request):
+    """Вернуть страницу результатов поиска в JSON."""
+    page_obj = search_page(
+        request.GET.get("q", "").strip(), request.GET.get(CURSOR_PARAM)
+    )
+    return JsonResponse({
+        "results": [
+            {
+                "id": post.pk,
+                "text": post.text,
+                "author": post.author.username,
+                "group": post.group.slug if post.group else None,
+                "pub_date": post.pub_date.isoformat(),
+                "url": reverse("posts:post_detail", args=[post.pk]),
+            }
+            for post in page_obj
+        ],
+        "next_cursor": page_obj.next_cursor,
+    })
+
+
+def post_comments(request, post_id):
+    """Вернуть следующую страницу комментариев поста в JSON."""
+    post = get_object_or_404(Post.objects.visible().only("pk"), pk=post_id)
+    comments = comments_paginator(request, post)
+    return JsonResponse({
+        "comments": [
+            {
+                "id": comment.pk,
+                "author": comment.author.username,
+                "author_url": reverse(
+                    "posts:profile", args=[comment.author.username]
+                ),
+                "text": comment.text,
+                "created": comment.created.isoformat(),
+            }
+            for comment in comments
+        ],
+        "next_cursor": comments.next_cursor,
+    })
+
+
 @login_required
+@ratelimit('post_create')
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
     )
-    if form.is_valid():
+    image_form = PostImageForm(
+        request.POST or None,
+        files=request.FILES or None,
+        oversized=oversized_fields(request),
+    )
+    if all([form.is_valid(), image_form.is_valid()]):
         post = form.save(commit=False)
         post.author = request.user
+        image = image_form.save()
+        if image:
+            post.image = image
         post.save()
         return redirect('posts:profile', username=request.user)
-    return render(request, 'posts/create_post.html', {'form': form})
+    return render(request, 'posts/create_post.html', {
+        'form': form,
+        'image_form': image_form,
+    })
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = PostForm(
@@ -74,14 +203,24 @@ def post_edit(request, post_id):
         files=request.FILES or None,
         instance=post,
     )
+    image_form = PostImageForm(
+        request.POST or None,
+        files=request.FILES or None,
+        oversized=oversized_fields(request),
+    )
     if post.author != request.user:
         return redirect("posts:post_detail", post_id)
-    if form.is_valid():
-        form.save()
+    if all([form.is_valid(), image_form.is_valid()]):
+        post = form.save(commit=False)
+        image = image_form.save()
+        if image:
+            post.image = image
+        post.save()
         return redirect("posts:post_detail", post.pk)
     is_edit = True
     context = {
         "form": form,
+        "image_form": image_form,
         "post_id": post_id,
         "is_edit": is_edit,
     }
@@ -93,8 +232,10 @@ def post_edit(request, post_id):
 
 
 @login_required
+@ratelimit('add_comment')
+@transaction.atomic
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.visible(), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
@@ -102,3 +243,34 @@ def add_comment(request, post_id):
         comment.post = post
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
+
+
+@login_required
+def follow_index(request):
+    """Вернуть ленту постов авторов, на которых подписан пользователь."""
+    page_obj = timeline_page(request.user, request.GET.get(CURSOR_PARAM))
+    return render(request, "posts/follow.html", {"page_obj": page_obj})
+
+
+@login_required
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect("posts:profile", username=username)
+
+
+@login_required
+def profile_unfollow(request, username):
+    follow = Follow.objects.filter(
+        user=request.user, author__username=username
+    ).first()
+    if follow is not None:
+        follow.delete()
+    return redirect("posts:profile", username=username)
+
+
+@staff_member_required
+def page_cache_stats(request):
+    """Вернуть счётчики попаданий и промахов страничного кэша."""
+    return JsonResponse(page_cache_stats_data())
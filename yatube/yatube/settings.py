@@ -14,6 +14,83 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 POST_PER_PAGE = 10
 
+COMMENTS_PER_PAGE = 20
+
+GROUPS_PER_PAGE = 50
+
+PAGE_CACHE_TIMEOUT = 60
+
+# Сколько живёт поколение области страничного кэша, с. Оно же - версия
+# ETag лент; с кэшем в памяти каждого процесса сброс в одном процессе
+# не виден другим дольше этого срока.
+PAGE_GENERATION_TIMEOUT = 300
+
+POST_THUMBNAIL_GEOMETRY = '960x339'
+
+# Загрузки больше FILE_UPLOAD_MAX_MEMORY_SIZE пишутся во временный файл
+# кусками; файл больше UPLOAD_MAX_BYTES обрывается, не дойдя до диска.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+
+FILE_UPLOAD_HANDLERS = [
+    'core.uploads.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+
+# Картинки постов больше POST_IMAGE_MAX_SIDE точек по стороне
+# отклоняются, остальные уменьшаются до POST_IMAGE_STORED_SIDE
+# и перекодируются в POST_IMAGE_FORMAT.
+POST_IMAGE_MAX_SIDE = 8000
+
+POST_IMAGE_STORED_SIDE = 1920
+
+POST_IMAGE_FORMAT = 'WEBP'
+
+POST_IMAGE_QUALITY = 80
+
+SEARCH_BACKEND = 'posts.search.SqliteFTSBackend'
+
+# Доля запросов, которые замеряет core.profiling.ProfilingMiddleware;
+# 0 - не замерять и не подменять отрисовку шаблонов.
+PROFILING_SAMPLE_RATE = 0.01
+
+PROFILING_BUFFER_SIZE = 1000
+
+# Потоки, в которых процесс сразу выполняет свои фоновые задачи core.jobs
+# (миниатюры, рассылка в ленты подписчиков); 0 - выполнять сразу после
+# коммита в том же потоке. Повторы после ошибок выполняет run_jobs.
+BACKGROUND_WORKERS = 2
+
+# Потоки, в которых страницы группы, профиля и поста одновременно
+# выполняют свои независимые запросы (core.fanout.gather); 0 - по очереди.
+# Пул общий на процесс и держит свои соединения с базой, а на локальной
+# SQLite выигрыша не даёт, поэтому выключен, пока замер benchmark
+# --fanout на сетевой базе не покажет пользы.
+READ_FANOUT_WORKERS = 0
+
+JOB_MAX_ATTEMPTS = 5
+
+# Пауза перед повтором удваивается с каждой попыткой, с.
+JOB_RETRY_DELAY = 10
+
+JOB_RETRY_MAX_DELAY = 3600
+
+# Исполнитель продлевает блокировку задачи каждую треть этого срока;
+# задача без продления дольше срока считается брошенной, с.
+JOB_LOCK_TIMEOUT = 600
+
+# Сколько строк обрабатывает одна фоновая задача модерации из админки.
+MODERATION_CHUNK_SIZE = 200
+
+# Посты авторов с большим числом подписчиков не рассылаются по лентам,
+# а подмешиваются при чтении.
+FOLLOW_FANOUT_LIMIT = 10000
+
+# Сколько последних постов автора попадает в ленту при подписке.
+FOLLOW_BACKFILL_POSTS = 100
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
@@ -44,6 +121,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,18 +129,34 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.db.PrimaryStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATE_DIR = os.path.join(BASE_DIR, 'templates')
 
+# С TEMPLATE_CACHE шаблоны компилируются один раз на процесс и
+# прогреваются при старте (core.templating.warm_templates). При DEBUG
+# кэш по умолчанию выключен, чтобы правки шаблонов видны были сразу;
+# YATUBE_TEMPLATE_CACHE=1 включает его и в dev-режиме.
+TEMPLATE_CACHE = bool(int(os.getenv('YATUBE_TEMPLATE_CACHE', not DEBUG)))
+
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATE_DIR, ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -76,13 +170,64 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Страничный кэш и валидаторы лент должны быть общими для всех процессов
+# сервера: YATUBE_CACHE_BACKEND=django.core.cache.backends.memcached.\
+# MemcachedCache YATUBE_CACHE_LOCATION=127.0.0.1:11211. Кэш в памяти
+# процесса годится только для разработки (check --deploy: core.W001).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'YATUBE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('YATUBE_CACHE_LOCATION', ''),
+    }
+}
+
+# Соединения не закрываются после запроса, а переиспользуются потоком
+# сервера до CONN_MAX_AGE секунд.
+DATABASE_CONN_MAX_AGE = int(os.getenv('YATUBE_DB_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+    }
+}
+
+# Реплики только для чтения перечисляются через запятую:
+# YATUBE_DB_REPLICAS=replica1.sqlite3,replica2.sqlite3. Они повторяют
+# настройки default с другим NAME; в тестах это зеркала default.
+for number, name in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, name.strip()),
+        'TEST': {'MIRROR': 'default'},
     }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает с основной базы.
+REPLICA_STICKY_SECONDS = 5
+
+# Лимиты изменяющих запросов core.ratelimit: число запросов за секунду (s),
+# минуту (m), час (h) или сутки (d) отдельно на пользователя и на IP.
+RATE_LIMITS = {
+    'post_create': '10/m',
+    'add_comment': '30/m',
+    'signup': '5/h',
 }
 
+RATELIMIT_MAX_KEYS = 100000
+
+# Адреса обратных прокси: за ними адрес клиента берётся из X-Forwarded-For.
+RATELIMIT_TRUSTED_PROXIES = []
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -111,3 +256,15 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+
+# Без DEBUG collectstatic добавляет к именам файлов хэш содержимого,
+# и {% static %} отдаёт адреса, которые CDN может кэшировать навсегда.
+if not DEBUG:
+    STATICFILES_STORAGE = (
+        'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+    )
+
+# Страницы about и ошибок, заранее отрисованные prerender_pages.
+PRERENDERED_DIR = os.path.join(BASE_DIR, 'prerendered')